@@ -0,0 +1,127 @@
+### arguments.py
+# The command line arguments, kept apart from the search itself so that '--help' (and the GUI's defaults) don't have to load a web browser library to answer
+
+import os
+import pathlib # used for managing paths to output files
+import argparse
+
+from tweetinstone.version import __version__
+from tweetinstone.network import profiles
+from tweetinstone.encode import encodeprofiles
+
+### args_setup():
+# Create and return arg parser
+# 'command' is the subcommand (such as 'batch') the parser is for, if any
+def parser_setup(command: str = None) -> argparse.ArgumentParser:
+	if command is None:
+		prog = 'tis'
+	else:
+		prog = 'tis ' + command
+	
+	# 'tis export' doesn't search for anything, so it has its own short list of options
+	if command == 'export':
+		return export_parser_setup()
+	
+	### Manage command line arguments and help menu ###
+	# Some of these are commented out - they're features that don't exist yet, but theoretically might someday
+	parser = argparse.ArgumentParser(prog=prog, usage='%(prog)s [options] [url]', description="Automatically save screenshots and metadata of tweets", epilog="Good luck and happy archiving, -M")
+	
+	# TODO POLISH: reconsider making input and urls mutually exclusive
+	inputgroup = parser.add_argument_group(title='input options', description='either input an arbitrary number of urls or a file containing urls to search')
+	inputgroup.add_argument('urls', metavar='[url] or [url1 url2 ...]', type=str, nargs='*', help='a url (or a group of space-separated urls) of tweet(s)', action='append')
+	inputgroup.add_argument('-i','--input', metavar='[file.txt]', type=argparse.FileType('r'), help="the path to a file of line-separated urls ('-' to read them from stdin as they arrive)", required=False, action='store')
+	inputgroup.add_argument('-f','--follow', help="keep waiting for more urls to be added to the end of the input file, like 'tail -f'", required=False, action='store_true', default=False)
+	
+	# Searches from a file are recorded in a journal as they go, so a run that dies partway through can pick up where it left off
+	inputgroup.add_argument('--skip-existing', help="skip urls whose archive already exists in the current directory", required=False, action='store_true', default=False)
+	inputgroup.add_argument('--resume', help="skip urls that the journal has recorded as already captured", required=False, action='store_true', default=False)
+	inputgroup.add_argument('--journal', metavar='[file.sqlite]', type=str, help="the journal that records the state of each search (default: tis_journal.sqlite)", required=False, action='store', default="tis_journal.sqlite")
+	
+	# `--only` and `--thread` are mutually exclusive because, duh!
+	#amountgroup = parser.add_mutually_exclusive_group()
+	# However, to better sort them I'll just put them in a regular group
+	amountgroup = parser.add_argument_group(title='scope options', description='options that restrict or expand how many tweets are grabbed (by default, %(prog)s grabs the tweet and everything it is replying to)')
+	amountgroup.add_argument('-o','--only', help="Only grab the specific tweet, not what it is replying to", required=False, action='store_true', default=False)
+	amountgroup.add_argument('-t','--thread', help="get every tweet in the user's thread (before and after the tweet)", required=False, action='store_true')
+	amountgroup.add_argument('--ancestors', help="how the tweets before the tweet are grabbed; 'page' captures them from the tweet's own page where they're already shown, 'navigate' opens each of their pages in turn, which is slower (default: page)", required=False, action='store', default='page', choices=['page','navigate'])
+	
+	# TODO FUTURE: Add these options?
+	#parser.add_argument('-r','--retweet', help="get the tweet a quote retweet is quoting", required=False, action='store_true')
+	#parser.add_argument('-a','--all-tweets', help="get ALL tweets visible from the first tweet; 'shotgun mode'", required=False, action='store_true')
+	
+	customgroup = parser.add_argument_group(title='customization options', description='web browser options that change the appearance of the output images/video')
+	
+	# Default is dark mode because I'm a gracious human
+	customgroup.add_argument('--color', help="set browser color scheme (default: dark)", required=False, action='store', default='dark', choices=['dark','light'])
+	
+	### DPI Scaling factor
+	# 1 is default css, I don't recommend going that low; at least use 2
+	# If you're curious about this, you can see the DPI scaling factor for various devices at: https://github.com/microsoft/playwright/blob/main/packages/playwright-core/src/server/deviceDescriptorsSource.json
+	customgroup.add_argument('-s','--scale', metavar='[integer]', type=int, help="DPI scaling factor (default: 4)", required=False, action='store', default=4)
+	
+	### Locale & Time Zone
+	# Not everyone lives on the east coast of the US? I'll believe that when I see it... but I'll make it easy for you to change this, if this matters to you
+	customgroup.add_argument('-l','--locale', metavar='[string]', type=str, help="set locale of the web browser   (default: en-US)", required=False, action='store', default="en-US")
+	customgroup.add_argument('--timezone', metavar='[string]', type=str, help="set time zone of the web browser (default: America/New_York)", required=False, action='store', default="America/New_York")
+
+	performancegroup = parser.add_argument_group(title='performance options', description='options that change how quickly large lists of urls are searched')
+
+	performancegroup.add_argument('--network-profile', help="what the web browser is allowed to load; 'lean' skips analytics, ads, sidebars and video streams that never show up in the capture (default: lean)", required=False, action='store', default='lean', choices=list(profiles.keys()))
+	performancegroup.add_argument('--profile-dir', metavar='[path/to/directory]', type=str, help="keep the web browser's profile and cache in this directory between runs, so x.com's scripts and fonts aren't downloaded every time", required=False, action='store')
+	performancegroup.add_argument('--cache-size', metavar='[integer]', type=int, help="size cap in MB for the browser's disk cache when using --profile-dir (default: 256)", required=False, action='store', default=256)
+	performancegroup.add_argument('--ready-timeout', metavar='[seconds]', type=float, help="how long to wait for a page to show its tweet before reloading it, up to 3 tries (default: 15)", required=False, action='store', default=15)
+	performancegroup.add_argument('--warmup', help="load x.com once before the first search so the first search isn't slowed down by a cold start", required=False, action='store_true', default=False)
+	performancegroup.add_argument('--timings', metavar='[file.jsonl]', type=str, nargs='?', const="tis_timings.jsonl", help="record how long each stage of each search takes to a JSONL file, and print a summary at the end (default: tis_timings.jsonl)", required=False, action='store')
+	performancegroup.add_argument('--link-timeout', metavar='[seconds]', type=float, help="how long to wait on each shortened link being resolved (default: 10)", required=False, action='store', default=10)
+	performancegroup.add_argument('--link-cache', metavar='[file.sqlite]', type=str, nargs='?', const="tis_links.sqlite", help="remember where shortened links go between runs, so the same link isn't resolved again (default: tis_links.sqlite)", required=False, action='store')
+	performancegroup.add_argument('--link-cache-days', metavar='[days]', type=float, help="how long a link in the link cache is trusted for (default: 30)", required=False, action='store', default=30)
+	performancegroup.add_argument('--link-cache-size', metavar='[integer]', type=int, help="the most links kept in the link cache; the least recently resolved are dropped first (default: 10000)", required=False, action='store', default=10000)
+	performancegroup.add_argument('--reuse-media', help="take tweet images from the web browser, which has already loaded them or has a connection open to fetch them, instead of downloading them again separately", required=False, action='store_true', default=False)
+	performancegroup.add_argument('--media-store', metavar='[path/to/directory]', type=str, help="keep images and videos in this shared directory by their sha256 instead of in each archive, so media saved by many searches is only kept once ('tis export' puts it back)", required=False, action='store')
+	performancegroup.add_argument('--encode-jobs', metavar='[integer]', type=int, help="number of videos ffmpeg composites at the same time, in the background while the web browser carries on (default: half the number of CPU cores)", required=False, action='store', default=max(1, (os.cpu_count() or 2) // 2))
+	performancegroup.add_argument('--encode-profile', help="how composited videos are encoded; 'fast' is about 720p and quick to encode, 'balanced' about 1080p, and 'archival' keeps the full size of the screenshot at high quality, which is slowest (default: balanced)", required=False, action='store', default='balanced', choices=list(encodeprofiles.keys()))
+	# Each job gets its own browser context and page, so jobs don't step on each other's navigation
+	performancegroup.add_argument('-j','--jobs', metavar='[integer]', type=int, help="number of searches to run at the same time (default: 1)", required=False, action='store', default=1)
+	
+	# Only 'tis serve' listens for searches instead of taking urls
+	if command == 'serve':
+		servegroup = parser.add_argument_group(title='serve options', description='options for running as a local service that keeps its web browser open between searches')
+		servegroup.add_argument('--host', metavar='[address]', type=str, help="address to listen on (default: 127.0.0.1)", required=False, action='store', default="127.0.0.1")
+		servegroup.add_argument('--port', metavar='[integer]', type=int, help="port to listen on (default: 8765)", required=False, action='store', default=8765)
+		servegroup.add_argument('--keep-jobs', metavar='[integer]', type=int, help="how many finished jobs are remembered for polling; the oldest are forgotten first (default: 1000)", required=False, action='store', default=1000)
+		servegroup.add_argument('--socket', metavar='[path]', type=str, help="listen on a unix socket at this path instead of a port", required=False, action='store')
+	
+	# Only 'tis batch' splits the searches across processes
+	if command == 'batch':
+		batchgroup = parser.add_argument_group(title='batch options', description='options for splitting a list of urls across several processes, each with its own web browser')
+		batchgroup.add_argument('-w','--workers', metavar='[integer]', type=int, help="number of worker processes (default: number of CPU cores)", required=False, action='store', default=os.cpu_count() or 1)
+
+	# Some basic default options
+	parser.add_argument('-v','--verbose', help="print debug information to stdout to see progress", action='store_true', default=False)
+	parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+	parser.add_argument('-g','--gui', help="Launch with GUI", required=False, action='store_true')
+	
+	# TODO FUTURE FEATURE
+	#parser.add_argument('-d','--directory', metavar='[path/to/directory]', type=pathlib.Path, help="Save output files to a specific directory", required=False, action='store')
+	
+	# Not strictly required, but recommended
+	parser.add_argument('-c','--cookies', metavar='[file.txt]', type=argparse.FileType('r'), help="A file containing the session token for a user found in browser cookies", required=False, action='store')
+	parser.add_argument('--generate', metavar='[file.txt]',type=pathlib.Path, help="Prompts for the auth_token string and creates a cookie file from it at the specified file name", required=False, action='store')
+	
+	# Hidden, since it's only for the offline benchmark (tests/benchmark): send every request to a local stand-in for x.com instead
+	parser.add_argument('--mirror', metavar='[url]', type=str, help=argparse.SUPPRESS, required=False, action='store')
+	# TODO FUTURE POLISH: implement default cookie usage when a cookie.txt file is present
+	#parser.add_argument('-n','--no-cookies', help="Don't use the default 'cookie.txt' file", required=False, action='store_true')
+
+	return parser
+
+### export_parser_setup(): the arg parser for 'tis export'
+def export_parser_setup() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(prog='tis export', usage='%(prog)s [options] [archive.zip ...]', description="Write self-contained copies of archives that were saved with '--media-store', with their media put back in")
+	parser.add_argument('archives', metavar='[archive.zip ...]', type=str, nargs='+', help='the archives to export')
+	parser.add_argument('--media-store', metavar='[path/to/directory]', type=str, help="the media store the archives were saved with", required=True, action='store')
+	parser.add_argument('-o','--output', metavar='[path/to/directory]', type=str, help="directory to write the exported archives to (default: exported)", required=False, action='store', default="exported")
+	parser.add_argument('-v','--verbose', help="print debug information to stdout to see progress", action='store_true', default=False)
+	parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+	
+	return parser
@@ -0,0 +1,115 @@
+### batch.py
+# Functions for 'tis batch', which splits a list of urls across several processes
+# Screenshot encoding, html parsing, hashing and zipping all hold the GIL, so a single process can only ever use one core no matter how many jobs it runs
+
+import os
+import asyncio
+import logging
+import multiprocessing
+
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor
+
+## Import TIS-specific functions
+from tweetinstone.search import run_searches, report_failures
+from tweetinstone.timing import start_timings, print_timings
+from tweetinstone.progress import Progress
+from tweetinstone.journal import open_journal, timestamp
+from tweetinstone.text_ops import parseTweetURL, canonicalURL
+
+### batch_worker(): search one shard of the urls in its own process
+# Runs inside of the worker process, so it sets up its own logging, cookie file and web browser
+def batch_worker(args, cookiefile: str, urls: list, workernum: int) -> list:
+	if args.verbose:
+		logging.basicConfig(level=logging.DEBUG)
+	else:
+		logging.basicConfig(level=logging.INFO)
+
+	log = logging.getLogger(__name__)
+	log.debug("Worker #" + str(workernum) + " searching " + str(len(urls)) + " urls")
+
+	# Chromium locks its profile directory, so each worker keeps its own profile inside of it
+	if args.profile_dir is not None:
+		args.profile_dir = os.path.join(args.profile_dir, "worker_" + str(workernum))
+
+	# Open files can't be handed between processes, so the cookie file is opened again here
+	if cookiefile is not None:
+		args.cookies = open(cookiefile, 'r')
+
+	return asyncio.run(run_searches(args, urls, Progress()))
+
+### unfinished(): the urls of a dead worker's shard that weren't captured
+# The journal (when there is one) knows which of its searches finished before it died; otherwise they're all reported as failed
+# 'started' is when the batch started (see timestamp()), so searches captured by an earlier run don't count
+def unfinished(args, shard: list, started: str) -> list:
+	journal = open_journal(args)
+	if journal is None:
+		return list(shard)
+
+	try:
+		completed = journal.completed(started)
+	finally:
+		journal.close()
+
+	return [url for url in shard if parseTweetURL(url) is None or canonicalURL(url) not in completed]
+
+### run_batch(): shard the urls across worker processes and merge the results into one report
+async def run_batch(args, urls: list):
+	log = logging.getLogger(__name__)
+
+	# Never start more workers than there are urls to search
+	num_workers = max(1, min(args.workers, len(urls)))
+
+	# The cookie and input files are open file objects which can't be pickled, so only the cookie file's name is handed to the workers
+	cookiefile = None
+	if args.cookies:
+		cookiefile = args.cookies.name
+
+	workerargs = copy(args)
+	workerargs.cookies = None
+	
+	# The workers only need the input file's name, so they know to keep a journal for a search from a file
+	if args.input:
+		workerargs.input = args.input.name
+
+	# Interleave the urls so that each worker gets a similar mix of the list
+	shards = []
+	for workernum in range(num_workers):
+		shards.append(urls[workernum::num_workers])
+
+	# Every worker appends its timings to the same file
+	start_timings(args)
+	
+	print("Batch: " + str(len(urls)) + " searches across " + str(num_workers) + " worker processes")
+
+	# 'spawn' gives each worker a clean process; playwright doesn't survive being forked from a process that has an event loop running
+	# Each worker gets a pool of its own, since a process that dies (such as being killed for using too much memory) breaks the whole pool it's in,
+	# and every other worker in it would be killed along with it
+	loop = asyncio.get_running_loop()
+	started = timestamp()
+	pools = []
+	workers = []
+	try:
+		for workernum in range(num_workers):
+			pools.append(ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')))
+			workers.append(loop.run_in_executor(pools[workernum], batch_worker, workerargs, cookiefile, shards[workernum], workernum + 1))
+
+		results = await asyncio.gather(*workers, return_exceptions=True)
+	finally:
+		for pool in pools:
+			pool.shutdown()
+
+	# Merge each worker's failed searches into a single list
+	failedsearch = []
+	for workernum in range(num_workers):
+		result = results[workernum]
+		if isinstance(result, BaseException):
+			log.error("Worker #" + str(workernum + 1) + " died (" + type(result).__name__ + ": " + str(result) + ")")
+			failedsearch.extend(unfinished(args, shards[workernum], started))
+		else:
+			failedsearch.extend(result)
+
+	log.info("Batch complete: " + str(len(urls) - len(failedsearch)) + " of " + str(len(urls)) + " searches succeeded")
+	print_timings(args)
+
+	return report_failures(failedsearch)
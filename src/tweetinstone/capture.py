@@ -2,28 +2,29 @@
 
 ## Import TIS-specific functions
 from tweetinstone.version import __version__
-from tweetinstone.media_ops import takeVideoBytes
-from tweetinstone.file_ops import saveTxt, saveImage, saveZip, saveZipFile
+from tweetinstone.media_ops import takeVideoFile
+from tweetinstone.file_ops import saveImage, saveZip, saveZipFile, saveZipStream
+from tweetinstone.text_ops import parseTweetURL
+from tweetinstone.network import mirror_url
+from tweetinstone.encode import EncodeError, run_ffmpeg, probe, encode_settings, encode_options
+from tweetinstone.web_ops import resolve_links, download_files, downloadtimeout, spool, file_sha256, run_blocking, submit_video
 
 ## Import from libraries
+import os
+import re # For finding buttons by their exact text
 import json # For json.dumps
+import asyncio
 import math # Used for video compositing
-import urllib
-import ffmpeg
 import logging
-import hashlib # For getting sha256 of images
 import tempfile
-import requests # For getting images
 
-from ssl import SSLError # TODO FUTURE FIX
 from datetime import datetime # Used for system-time-based metadata
-from bs4 import BeautifulSoup # Used for parsing the html of the tweet text to grab emoji
 from io import BytesIO # Used for storing stuff in memory instead of temporary files where feasible
 from zipfile import ZipFile # Used for the zips
-from sys import getsizeof # For finding video filesize
 from copy import copy # Used for managing the json of arguments in a sane way
-from playwright.async_api import Page, Locator, expect, TimeoutError as PlaywrightTimeoutError # Used for loading and navigating pages with playwright
-from PIL import Image # For handling images
+from playwright.async_api import Page, Locator, TimeoutError as PlaywrightTimeoutError # Used for loading and navigating pages with playwright
+
+# ffmpeg-python, BeautifulSoup and PIL are imported by the functions that use them, so that nothing pays to load them until a tweet actually needs them
 
 ### killshot(): screenshotting what the browser looks like when you have some kind of fatal exception, for debugging purposes
 # Naturally this isn't perfect for any race conditions, but it's better than nothing
@@ -40,99 +41,71 @@ async def killshot(search, page: Page):
 		saveImage(shotname, finalscreenshot)
 
 ### capture_links(): Get all t.co links and what they resolve as
+# 'links' is the href of every link in the tweet, from tweet_metadata()
+# The links are resolved all at once, by resolve_links()
 #async def capture_links(tweet: Locator) -> list:
-async def capture_links(tweet: Locator, handle: str, id: str) -> list:
+async def capture_links(links: list, handle: str, id: str, args) -> list:
 	log = logging.getLogger(__name__)
-	tweetLinks = []
+	shortLinks = []
 	
-	links = await tweet.get_by_role("link").all()
-	for link in links:
-		tweetLink = await link.get_attribute('href')
+	for tweetLink in links:
 		if tweetLink is not None:
 			linkSplit = tweetLink.split('/')
 			if len(linkSplit) >= 4:
 				if linkSplit[2] == "t.co":
 					# Navigate to t.co links and see what they resolve to
 					log.debug("Resolving shortened link: " + tweetLink)
-					
-					linkdata = {'short': tweetLink}
-					try:
-						# context=ssl._create_unverified_context()
-						target = urllib.request.urlopen(tweetLink).geturl()
-					except urllib.error.HTTPError as HTTPError:
-						# Sometimes, these return 403 errors, but do resolve correctly, so I just jank it together
-						target = HTTPError.url
-						# For debugging purposes, to show that the resolution had some jank in it (and in case of legit access failures), also attach the fact that the error code was received
-						linkdata['error'] = "HTTP Error " + str(HTTPError.code) + ": " + HTTPError.msg
-					#except SSLError:
-					#	target = "UNKNOWN"
-					#	linkdata['error'] = "SSL Error: " + SSLError.reason
-					except urllib.error.URLError as URLError:
-						target = "UNKNOWN"
-						linkdata['error'] = "URL Error: " + str(URLError.reason)
-					
-					
-					# Put THAT url in as the target
-					linkdata['target'] = target
-					
-					# And put this data in the links array
-					tweetLinks.append(linkdata)
+					shortLinks.append(tweetLink)
 				# TODO Future feature?:
 				# See what other links there are and if they should be saved!
 				#elif linkSplit[1] != handle and linkSplit[3] != id:
 					#print("Other Link = " + tweetLink)
+	
 	# Return the list of links
-	return tweetLinks
+	return await resolve_links(shortLinks, args)
 
 ### capture_stats(): Get tweet stats
-async def capture_stats(tweet) -> dict:
+# 'stats' is how many of each stat button there are and the text of the first, keyed by test ID, from tweet_metadata()
+# Whichever of a pair is showing depends on whether you've done it yourself (e.g. 'like' or 'unlike'), so the text comes from the one that's there
+def capture_stats(stats: dict) -> dict:
 	log = logging.getLogger(__name__)
 	log.debug("### Tweet stats ###")
 	tweetStats = {}
 	
-	num_replies = ""
-	num_replies = await tweet.get_by_test_id("reply").inner_text()
+	num_replies = stats['reply']['text']
 	if num_replies != "":
 		tweetStats['replies'] = num_replies
 		log.debug("# of replies = " + num_replies)
 	
-	retweets   = await tweet.get_by_test_id("retweet").count()
-	unretweets = await tweet.get_by_test_id("unretweet").count()
-	num_retweets = ""
-	if retweets > unretweets:
-		num_retweets = await tweet.get_by_test_id("retweet").inner_text()
-	elif retweets < unretweets:
-		num_retweets = await tweet.get_by_test_id("unretweet").inner_text()
+	num_retweets = stat_text(stats, "retweet", "unretweet")
 	if num_retweets != "":
 		tweetStats['retweets'] = num_retweets
 		log.debug("# of retweets = " + num_retweets)
 	
-	likes      = await tweet.get_by_test_id("like").count()
-	unlikes    = await tweet.get_by_test_id("unlike").count()
-	num_likes = ""
-	if likes > unlikes:
-		num_likes = await tweet.get_by_test_id("like").inner_text()
-	elif likes < unlikes:
-		num_likes = await tweet.get_by_test_id("unlike").inner_text()
+	num_likes = stat_text(stats, "like", "unlike")
 	if num_likes != "":
 		tweetStats['likes'] = num_likes
 		log.debug("# of likes = " + num_likes)
 	
-	bookmarks  = await tweet.get_by_test_id("bookmark").count()
-	unbookmark = await tweet.get_by_test_id("removeBookmark").count()
-	num_bookmarks = ""
-	if bookmarks > unbookmark:
-		num_bookmarks = await tweet.get_by_test_id("bookmark").inner_text()
-	elif bookmarks < unbookmark:
-		num_bookmarks = await tweet.get_by_test_id("removeBookmark").inner_text()
+	num_bookmarks = stat_text(stats, "bookmark", "removeBookmark")
 	if num_bookmarks != "":
 		tweetStats['bookmarks'] = num_bookmarks
 		log.debug("# of bookmarks = " + num_bookmarks)
 	
 	return tweetStats
 
+### stat_text(): the text of whichever of a pair of stat buttons the tweet has more of
+def stat_text(stats: dict, button: str, undo: str) -> str:
+	if stats[button]['count'] > stats[undo]['count']:
+		return stats[button]['text']
+	elif stats[button]['count'] < stats[undo]['count']:
+		return stats[undo]['text']
+	return ""
+
 ### capture_text(): get the text in a smarter way that gets emoji
 def capture_text(html: str) -> dict:
+	from bs4 import BeautifulSoup # Used for parsing the html of the tweet text to grab emoji
+	
 	log = logging.getLogger(__name__)
 	
 	# Use beautifulsoup to parse the text and include emojis
@@ -192,44 +165,30 @@ def capture_text(html: str) -> dict:
 # Buuuuuut mainly because I want to call it even if we've composited a video
 # For example, a QRT that has a video, QRTing an image
 # Or a QRT with an image that is QRTing a video
-async def capture_images(zip: ZipFile, tweet: Locator, tweetInfo, directory):
+# 'photos' is the list of the tweet's photos from tweet_metadata()
+# The images are all downloaded at once, then written to the zip one at a time, since a zip can only have one file written to it at a time
+# 'store' is the MediaStore to keep them in instead of the zip, if there is one
+# 'media' is the page's MediaCapture, if images are to be taken from the browser instead of downloaded separately
+async def capture_images(zip: ZipFile, photos: list, tweetInfo, directory, timer, mirror: str = None, store = None, media = None):
 	log = logging.getLogger(__name__)
 	log.debug("### IMAGE CAPTURE ###")
 	
 	# TODO EDGE CASE: have it so that it checks that the <a> link wrapped around the image has an href of the current tweet - and then grab the rest on the quote	
 	imageArray = []
-	
-	tweetPhoto = tweet.get_by_test_id("tweetPhoto")
-	
-	images = await tweetPhoto.all()
+	imageFilenames = []
 	
 	imageiterator = 0
-	for image in images:
+	for image in photos:
 		# Increment iterator that's used for file name strings
 		imageiterator += 1
 		log.debug("Attempting capture of image #" + str(imageiterator))
 		
 		# Make sure this image isn't just a video thumbnail
-		try:
-			videoPlayer = image.get_by_test_id("videoPlayer")
-			await expect(videoPlayer).to_have_count(0)
-		except AssertionError as exception:
-			# There is a video player in this tweetPhoto, so exit
+		if image['video']:
 			continue
 		
-		log.debug("Image: " + str(image))
-		log.debug("Image HTML: " + await image.inner_html())
-		
 		# We'll have to clean up the url, but this will give us what we need
-		#imageUrl = await image.get_by_role("img").get_attribute("src")
-		imageHtml = image.get_by_role("img").first
-		log.debug("Image Role html: " + await imageHtml.inner_html())
-		
-		# TODO RELEASE?
-		# Assertion to ensure that the image has the img attribute. Reference: https://playwright.dev/python/docs/api/class-locatorassertions#locator-assertions-to-have-attribute
-		#await expect(imageHtml).to_have_attribute("src") # TODO NEEDS VALUE?
-		
-		imageUrl = await imageHtml.get_attribute("src")
+		imageUrl = image['src']
 		
 		# Get the name and the format of the image from that thumbnail link
 		imageName   = imageUrl.split('/')[4].split('?')[0]
@@ -245,29 +204,54 @@ async def capture_images(zip: ZipFile, tweet: Locator, tweetInfo, directory):
 		
 		log.debug("Image #" + str(imageiterator) + ": " + imageUrl + imageFormat)
 		
-		# TODO OPTIMIZATION: potentially use asyncio for this more directly?
-		# Reference: https://likegeeks.com/downloading-files-using-python/
-		imageData = requests.get(image_original)
-		# TODO EDGE CASE: in the future, just check if the returned image is zero bytes and then do the request again?
-		
 		# Returns 'image' for images without alt text
-		imageAlt = await image.get_by_role("img").get_attribute("alt")
+		imageAlt = image['alt']
 		
-		# Write image to file
 		image_filename = "image_" + tweetInfo['author'] + "_" + tweetInfo['id'] + "_n" + str(imageiterator) + "_id_" + imageName + "." + imageFormat
-		saveZip(zip, directory + image_filename, imageData.content)
-		
-		# Reference: https://docs.python.org/3/library/hashlib.html
-		imageHash = hashlib.sha256()
-		imageHash.update(imageData.content)
+		imageFilenames.append(image_filename)
+		imageArray.append({'url': image_original, 'alt': imageAlt})
+	
+	# Each image is hashed as it's downloaded, so it's never held in memory all at once just to be hashed
+	with timer.span("image_download", tweetInfo['id']):
+		downloads = [None] * len(imageArray)
+		
+		if media is not None:
+			reused = await asyncio.gather(*[media.fetch(imageInfo['url'], downloadtimeout) for imageInfo in imageArray])
+			for imageindex in range(len(imageArray)):
+				if reused[imageindex] is not None:
+					downloads[imageindex] = spool(reused[imageindex])
+		
+		# Anything the browser couldn't provide is downloaded directly
+		missing = [imageindex for imageindex in range(len(imageArray)) if downloads[imageindex] is None]
+		if len(missing) > 0:
+			downloaded = await download_files([mirror_url(mirror, imageArray[imageindex]['url']) for imageindex in missing])
+			for missingindex in range(len(missing)):
+				downloads[missing[missingindex]] = downloaded[missingindex]
+	
+	# 'zip' is the archive here, so the images are matched up with their downloads by position
+	for imageindex in range(len(imageArray)):
+		(imageFile, imageHash) = downloads[imageindex]
 		
-		imageArray.append({'url': image_original, 'alt': imageAlt, 'sha256': imageHash.hexdigest()})
+		# Write image to file
+		with imageFile:
+			if store is not None:
+				store.save(directory + imageFilenames[imageindex], imageFile, imageHash)
+			else:
+				saveZipStream(zip, directory + imageFilenames[imageindex], imageFile)
+		imageArray[imageindex]['sha256'] = imageHash
 	return imageArray
 
 ### capture_video()
 # Lots of insane ffmpeg magic
 # Beware ye who enter here
-async def capture_video(args, zip: ZipFile, tweet: Locator, directory: str, name: str, progress_callback):
+# 'url' is the tweet's own url, since the page may be showing some other tweet (such as one that's replying to it)
+# 'videotext' is the text in the video player, from tweet_metadata()
+# 'store' is the MediaStore to keep the original video in instead of the zip, if there is one
+# 'download' is the video's download from start_video_download(), if it's already been started
+async def capture_video(args, zip: ZipFile, tweet: Locator, url: str, directory: str, name: str, timer, id: str, videotext: str, store, download, progress_callback):
+	import ffmpeg
+	from PIL import Image, ImageDraw # For handling images
+	
 	log = logging.getLogger(__name__)
 	log.debug("### VIDEO CAPTURE ###")
 	
@@ -302,218 +286,352 @@ async def capture_video(args, zip: ZipFile, tweet: Locator, directory: str, name
 	# request.url
 	### End multi-video investigation
 	
-	### Get the requisite files for the composite ###
-	# Take a screenshot masking out the video portion
-	screenshot = await tweet.screenshot(scale="device", mask=[tweetVideo])
-	
-	# Write the 'mask' screenshot to a temporary file for FFMPEG to use
-	imagefile = tempfile.NamedTemporaryFile()
-	imagefile.write(screenshot)
-	
 	# Use yt-dlp to grab the video
-	download = await takeVideoBytes(args.cookies, tweet.page.url)
-	if download[0] != 0:
-		# The yt-dlp download failed. Safely exit the capture and mark the search as failed to fail safely
-		return (False, screenshot)
-	
-	videoBytes = download[1]
+	# It's downloaded straight to a scratch directory, which also holds everything ffmpeg needs and makes, so the video never has to fit in memory
+	if download is None:
+		download = start_video_download(args, url)
+	(scratch, future) = download
 	
-	# TODO FUTURE FEATURE: move this over to multi-video capture?
-	# Save the original video to zip
+	# The scratch directory is handed to the composite once it's started. Until then, it's thrown away however this ends (including a timeout, or being cancelled)
+	encode = None
 	try:
-		videoBytes.seek(0)
-	except ValueError:
-		log.error("ValueError: I/O operation on closed file") # I've gotten this when a video download didn't work properly and it showed up as 
-		sys.exit(1) #TODO: proper error handling
-	
-	saveZip(zip, directory + "video_" + name + ".mp4", videoBytes.read())
-	
-	# Save the video to a temporary file that FFMPEG can easily see because getting ffmpeg-python to take two separate inputs through stdin would cost me sanity points that I cannot afford to lose
-	# Reference: https://docs.python.org/3/library/tempfile.html
-	vidfile = tempfile.NamedTemporaryFile()
-	videoBytes.seek(0)
-	vidfile.write(videoBytes.read())
-	
-	### Composite the video together ###
-	# Bounding boxes of the page's elements are used to calculate sizes and offsets for ffmpeg magic
-	tweetbox = await tweet.bounding_box()
-	vidbox   = await tweetVideo.bounding_box()
-	
-	# I do multiple pads on the clip; the second pad is purely to blend in with the background of the tweet, which is small but scales with the DPI
-	# This sets the color of the second pad:
-	if args.color == 'light':
-		bordercolor = 'white'
-	else:
-		bordercolor = 'black'
-	
-	# Size of the border pad. Just needs to be big enough to handle any minor misalignments
-	bordersize = args.scale * 5
-		
-	# The third pad is the full pad which sizes it to the full tweet for the overlay. 
-	# it's magenta because it will fill in the keyed out parts of a user's avatar that had the exact same magenta color in the png mask
-	
-	# Overall the scaling/offsets seem to break at non-even resolution scales?
-	
-	# The x/y size of the tweet image, grabbed from that image itself
-	probe = ffmpeg.probe(imagefile.name)
-	video_streams = [stream for stream in probe["streams"] if stream["codec_type"] == "video"]
-	tweetWidth  = video_streams[0]['width']
-	tweetHeight = video_streams[0]['height']
-	
-	# The x/y size of the box the video is embedded in
-	videoBoxWidth    = vidbox["width"]  * args.scale
-	videoBoxHeight   = vidbox["height"] * args.scale
-	
-	# Grab the TRUE video size from the video file itself
-	probe = ffmpeg.probe(vidfile.name)
-	# Kudos to https://stackoverflow.com/a/58896685 for keeping it simple & easy
-	video_streams = [stream for stream in probe["streams"] if stream["codec_type"] == "video"]
-	
-	# Make sure this uses the height if it was scaled accurated with the DPI of the tweet
-	videoWidth = video_streams[0]['width']
-	videoHeight = video_streams[0]['height']
-	
-	### Calculation of black bar crop size to preserve aspect ratio
-	# Get the videoBoxHeight divided by videoHeight
-	heightratio = videoBoxHeight/videoHeight
-	# Multiple the videoWidth by that ratio
-	cropwidth = videoWidth * heightratio
-	# Subtract that from the videoBoxWidth, divide by 2 (since we pad it on each side)
-	croppad = (videoBoxWidth - cropwidth)/2
-	# Round up to an even number
-	croppad = math.ceil(croppad)
+		### Get the requisite files for the composite ###
+		# Take a screenshot masking out the video portion
+		with timer.span("screenshot", id):
+			screenshot = await tweet.screenshot(scale="device", mask=[tweetVideo])
+		
+		# The download is usually already underway, so this only times how long it's waited on
+		with timer.span("video_download", id):
+			result = await asyncio.wrap_future(future)
+		if result[0] != 0:
+			# The yt-dlp download failed. Safely exit the capture and mark the search as failed to fail safely
+			return (False, screenshot, None)
+		
+		videofile = result[1]
+		
+		# TODO FUTURE FEATURE: move this over to multi-video capture?
+		# Save the original video to zip
+		if store is not None:
+			# Hashing and copying a video takes a while, so it's done on a thread rather than holding up every other job
+			await run_blocking(save_to_store, store, directory + "video_" + name + ".mp4", videofile)
+		else:
+			saveZipFile(zip, directory + "video_" + name + ".mp4", videofile)
+		
+		### Composite the video together ###
+		# Bounding boxes of the page's elements are used to calculate sizes and offsets for ffmpeg magic
+		tweetbox = await tweet.bounding_box()
+		vidbox   = await tweetVideo.bounding_box()
+		
+		# I do multiple pads on the clip; the second pad is purely to blend in with the background of the tweet, which is small but scales with the DPI
+		# This sets the color of the second pad:
+		if args.color == 'light':
+			bordercolor = 'white'
+		else:
+			bordercolor = 'black'
+		
+		# Size of the border pad. Just needs to be big enough to handle any minor misalignments
+		bordersize = args.scale * 5
+			
+		# The third pad is the full pad which sizes it to the full tweet for the overlay
+		# Only the part of it under the video box ever shows, so it's the same color as the border
+		
+		# Overall the scaling/offsets seem to break at non-even resolution scales?
+		
+		# The x/y size of the box the video is embedded in
+		videoBoxWidth    = vidbox["width"]  * args.scale
+		videoBoxHeight   = vidbox["height"] * args.scale
+		
+		### The mask: the screenshot, with the video box cut out of it so the video shows through
+		# The cut is rounded outwards so none of the mask's magenta is left at its edges; the border pad covers the difference
+		# This used to be done by keying out the magenta on every frame, which also keyed out anything else in the tweet that was the exact same magenta
+		maskLeft = math.floor((vidbox["x"] - tweetbox["x"]) * args.scale)
+		maskTop  = math.floor((vidbox["y"] - tweetbox["y"]) * args.scale)
+		with Image.open(BytesIO(screenshot)) as tweetImage:
+			# The x/y size of the tweet image, grabbed from that image itself
+			(tweetWidth, tweetHeight) = tweetImage.size
+			
+			mask = tweetImage.convert("RGBA")
+			ImageDraw.Draw(mask).rectangle((maskLeft, maskTop, maskLeft + math.ceil(videoBoxWidth), maskTop + math.ceil(videoBoxHeight)), fill=(0, 0, 0, 0))
+			
+			imagefile = os.path.join(scratch.name, "mask.png")
+			mask.save(imagefile, format='PNG')
+			mask.close()
+		
+		# The TRUE video size, which yt-dlp usually reports. Otherwise, it's grabbed from the video file itself
+		if result[2] is not None:
+			(videoWidth, videoHeight) = result[2]
+		else:
+			try:
+				with timer.span("probe", id):
+					videoprobe = await probe(videofile)
+			except EncodeError as error:
+				log.error("ffprobe error output:" + error.stderr)
+				return (False, screenshot, None)
+			
+			# Kudos to https://stackoverflow.com/a/58896685 for keeping it simple & easy
+			video_streams = [stream for stream in videoprobe["streams"] if stream["codec_type"] == "video"]
+			
+			# Make sure this uses the height if it was scaled accurated with the DPI of the tweet
+			videoWidth = video_streams[0]['width']
+			videoHeight = video_streams[0]['height']
+		
+		### Calculation of black bar crop size to preserve aspect ratio
+		# Get the videoBoxHeight divided by videoHeight
+		heightratio = videoBoxHeight/videoHeight
+		# Multiple the videoWidth by that ratio
+		cropwidth = videoWidth * heightratio
+		# Subtract that from the videoBoxWidth, divide by 2 (since we pad it on each side)
+		croppad = (videoBoxWidth - cropwidth)/2
+		# Round up to an even number
+		croppad = math.ceil(croppad)
 
-	# If the pad is under a pixel (according to DPI scale) then just set it to 0
-	# All of this croppad math is for vertical videos that have horizontal black bars in twitter's view, so if it's insignificant let's not worry about any warping
-	# TODO OPTIMIZATION: perhaps one day double check the perfection of the 'true' original screenshot INSTEAD of doing this
-	if croppad < args.scale:
-		croppad = 0
-		
-	# Add extra horizontal padding based on that number
-	
-	# TODO POLISH EDGE CASE: what if these get negative or weird? should I just absolute value them?
-	# The +2 here just helps align... wonky but works. Maybe not neede if the aspect ratio black bars were always around but I'm paranoid at this point
-	# xoffset and yoffset are the offsets of the 'video box' inside the wider tweet
-	xoffset = (round(vidbox["x"]) - round(tweetbox["x"]) + 2)*args.scale - bordersize
-	yoffset = (vidbox["y"] - tweetbox["y"])*args.scale - bordersize
-	
-	videoin    = ffmpeg.input(vidfile.name)
-	tweetaudio = videoin['a?'] # The '?' is in case the video has no audio
-	tweetpng   = ffmpeg.input(imagefile.name)
-	videoOut   = tempfile.NamedTemporaryFile()
-	
-	# No, I don't want to talk about it. It just works now.
-	tweetvideo = (
-		ffmpeg
-		# Scale vid up to the box size BUT preserve aspect ratio by reducing width by black bar size
-		.filter(videoin.video, 'scale', str(videoBoxWidth - (croppad * 2)), str(videoBoxHeight))
-		# Pad in black bars by padding to box size with black bar as x offset
-		.filter('pad', w=str(videoBoxWidth), h=0, x=str(croppad), y=0, color='black')
-		# Pad a border around the video in case of edge case misalignment because paranoia
-		.filter('pad', w=str(videoBoxWidth + (bordersize * 2)), h=str(videoBoxHeight + (bordersize * 2)), x=str(bordersize), y=str(bordersize), color=bordercolor)
-		# Pad to place this output where the video box is inside the wider tweet
-		.filter('pad', w=str(tweetWidth), h=str(tweetHeight), x=str(xoffset), y=str(yoffset), color='magenta')
-		.overlay(tweetpng.filter('colorkey', 'magenta', 0.01, 0))
-	)
-	# TODO FUTURE OPTIMIZATION: use colorkey_opencl for GPU-acceleration as an option, but you have to do hwupload and hwdownload and shit, see ffmpeg filter documentation in the opencl section
+		# If the pad is under a pixel (according to DPI scale) then just set it to 0
+		# All of this croppad math is for vertical videos that have horizontal black bars in twitter's view, so if it's insignificant let's not worry about any warping
+		# TODO OPTIMIZATION: perhaps one day double check the perfection of the 'true' original screenshot INSTEAD of doing this
+		if croppad < args.scale:
+			croppad = 0
+			
+		# Add extra horizontal padding based on that number
+		
+		# TODO POLISH EDGE CASE: what if these get negative or weird? should I just absolute value them?
+		# The +2 here just helps align... wonky but works. Maybe not neede if the aspect ratio black bars were always around but I'm paranoid at this point
+		# xoffset and yoffset are the offsets of the 'video box' inside the wider tweet
+		xoffset = (round(vidbox["x"]) - round(tweetbox["x"]) + 2)*args.scale - bordersize
+		yoffset = (vidbox["y"] - tweetbox["y"])*args.scale - bordersize
+		
+		videoin    = ffmpeg.input(videofile)
+		tweetaudio = videoin['a?'] # The '?' is in case the video has no audio
+		tweetpng   = ffmpeg.input(imagefile)
+		
+		# No, I don't want to talk about it. It just works now.
+		tweetvideo = (
+			ffmpeg
+			# Scale vid up to the box size BUT preserve aspect ratio by reducing width by black bar size
+			.filter(videoin.video, 'scale', str(videoBoxWidth - (croppad * 2)), str(videoBoxHeight))
+			# Pad in black bars by padding to box size with black bar as x offset
+			.filter('pad', w=str(videoBoxWidth), h=0, x=str(croppad), y=0, color='black')
+			# Pad a border around the video in case of edge case misalignment because paranoia
+			.filter('pad', w=str(videoBoxWidth + (bordersize * 2)), h=str(videoBoxHeight + (bordersize * 2)), x=str(bordersize), y=str(bordersize), color=bordercolor)
+			# Pad to place this output where the video box is inside the wider tweet
+			.filter('pad', w=str(tweetWidth), h=str(tweetHeight), x=str(xoffset), y=str(yoffset), color=bordercolor)
+			# The mask's transparency is where the video shows through
+			.overlay(tweetpng)
+		)
+		
+		# Random semi-related link: https://curiosalon.github.io/blog/ffmpeg-alpha-masking/#alpha-manipulation-with-ffmpeg
+		# Thank you, you ffmpeg wizard; this isn't what i used but it blew my mind
+		
+		#log.debug("Testing link printout")
+		# TODO FUTURE FEATURE: get links to every video, like with images
+		#mediaInfo['videos']
+		#vids = await tweetVideo.all()
+		#vidsJSON = {}
+		#for vid in vids:
+		#	# We'll have to clean up the url, but this will give us what we need
+		#	log.debug("\n\tall vids:")
+		#	vidtext = await vid.text_content()
+		#	print(vid)
+		#	print(vidtext)
+		#	print("----")
+		#	for vi in await vid.all():
+		#		log.debug("\n\tvi:")
+		#		print(vi)
+		#		vidURL = await vi.get_attribute("src")
+		#		if vidURL is not None:
+		#			log.debug("src = " + vidURL)
+		
+		# TODO future feature: better video metadata
+		#mediaInfo['video2'] = []
+		#mediaInfo['videos'].append('')
+		
+		### TODO CRIT RELEASE: test getting links
+		#vids = await tweetPhoto.all()
+		#imagesJSON = {}
+		# TODO: see; what I do in the image link grabber
+		#for image in images:
+		
+		# TODO FUTURE FEATURE:
+		### GIF detection & processing
+		# For the sake of making a gif tweet just exist as a gif, let's cut the bullshit and do it for you
+		# This can also be accomplished via some ffmpeg wizardry
+		# TODO POLISH: toggle-able algorithm to optimize GIF for a target file size for sharing on platforms such as discord
+		if videotext == "GIF": # This is broken in chrome! it works in firefox but there are other problems with firefox in playwright!
+			print("This tweet is a GIF! tweetinstone cannot auto-convert GIFs at this time")
+			
+			# TODO FUTURE: do this ffmpeg magic but in python
+			#ffmpeg -loglevel quiet -i input.mp4 -vf "fps=$FRAMERATE,scale=$WIDTH:-1:flags=lanczos,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse" -loop 0 output.mp4
+			
+			# TODO POLISH: have support for and options for gif optimization techniques
+			#gifsicle -O3 --lossy=$LOSSYLEVEL -o temporary-lossy.gif input.mp4
+			
+			# TODO OPTION: have some sort of timeout option based on video length/size?
+		
+		# The composite is left to finish in the background (see encode.py), so the web browser can move on without waiting on ffmpeg
+		encode = asyncio.ensure_future(composite_video(args, zip, tweetvideo, tweetaudio, tweetWidth, directory, name, timer, id, scratch, progress_callback))
+		# Removed once the composite is over, even if it's cancelled before it ever starts
+		encode.add_done_callback(lambda finished: scratch.cleanup())
+		
+		log.debug("Video capture done, with the composite running in the background")
+		return (True, screenshot, encode)
+	finally:
+		if encode is None:
+			discard_video_download(download)
+
+### save_to_store(): put a file on disk into the media store
+# Blocking, so it's run on a thread by capture_video()
+def save_to_store(store, filename: str, path: str) -> None:
+	with open(path, 'rb') as file:
+		store.save(filename, file, file_sha256(path))
+
+### composite_video(): run the composite that capture_video() set up, then save it and its first frame to the zip
+# 'tweetvideo' and 'tweetaudio' are the ffmpeg-python streams to output ('width' being how wide the video is), and 'scratch' the scratch directory it all happens in
+# The first frame is a second output of the same run, so the composite is only decoded and encoded once
+# Returns the composite's first frame, to use in place of the masked screenshot of the tweet
+# Raises EncodeError if ffmpeg fails, which only fails the search that the video is part of
+async def composite_video(args, zip: ZipFile, tweetvideo, tweetaudio, width: int, directory: str, name: str, timer, id: str, scratch, progress_callback) -> bytes:
+	import ffmpeg
+	
+	log = logging.getLogger(__name__)
 	
-	# Random semi-related link: https://curiosalon.github.io/blog/ffmpeg-alpha-masking/#alpha-manipulation-with-ffmpeg
-	# Thank you, you ffmpeg wizard; this isn't what i used but it blew my mind
+	videoOut     = os.path.join(scratch.name, "composite.mp4")
+	thumbnail    = os.path.join(scratch.name, "thumbnail.png")
+	progressfile = os.path.join(scratch.name, "progress.txt")
 	
 	log.debug("Beginning composite via ffmpeg")
+	progress_callback.emit((0, 0, progressfile, 5, None))
 	
-	progressfile = tempfile.NamedTemporaryFile()
-	try:
-		progress_callback.emit((0, 0, progressfile.name, 5, None))
-		vidprocess = (
-			ffmpeg
-			#.output(tweetaudio, "video_" + videoFilename, v='info', progress=True, nostats=True)
-			.output(tweetvideo, tweetaudio, videoOut.name, format='mp4', progress=progressfile.name)
-			.run(quiet=(not args.verbose), overwrite_output=True)
-			#.output(tweetvideo, tweetaudio, "pipe:", format='rawvideo', pix_fmt='rgb24')
-			#.run_async(pipe_stdout=True)
-		)
-	except ffmpeg._run.Error as ffmpegError:
-		log.error("ffmpeg error output:" + ffmpegError.stderr.decode("utf-8"))
-		sys.exit(1) # TODO RELEASE: DO SIMILAR ERROR HANDLING AS THE YT DL OUTPUT ERROR SO IT DOESNT KILL ALL SEARCHES
+	# The composite is split in two: all of it goes to the video, and its first frame goes to a png
+	frames = tweetvideo.split()
+	
+	# The video is encoded (and sized) by the encode profile, but the first frame stays the size of the screenshot it replaces
+	settings = encode_settings(args)
+	video = frames[0]
+	if settings['maxwidth'] is not None and width > settings['maxwidth']:
+		# -2 keeps the aspect ratio while keeping the height even, which x264 needs
+		video = video.filter('scale', settings['maxwidth'], -2)
 	
-	# TODO OPTIMIZATION: release progressfile?
+	composite = ffmpeg.merge_outputs(
+		ffmpeg.output(video, tweetaudio, videoOut, format='mp4', progress=progressfile, **encode_options(settings)),
+		ffmpeg.output(frames[1], thumbnail, vframes=1, format='image2', vcodec='png')
+	)
+	with timer.span("composite", id):
+		await run_ffmpeg(args, composite)
 	
 	# TODO POLISH: investigate ffmpeg's `-metadata` flag to add title and other metadata to video
 	
 	# Save the composited video to zip
-	saveZipFile(zip, directory + "capture_" + name + ".mp4", videoOut.name)
-	
-	### Generate a png out of the first frame of the video we just made ###
-	log.debug("Grabbing thumbnail via ffmpeg")
-	try:
-		thumbprocess = (
-			ffmpeg.input(videoOut.name)
-			.output(imagefile.name, vframes=1, format='apng')
-			#.run(capture_stdout=False, capture_stderr=False, overwrite_output=True)
-			.run(quiet=(not args.verbose), overwrite_output=True)
-		)
-	except ffmpeg._run.Error as ffmpegError:
-		log.error("ffmpeg error output:" + ffmpegError.stderr.decode("utf-8"))
-		sys.exit(1) # TODO RELEASE: DO SIMILAR ERROR HANDLING AS THE YT DL OUTPUT ERROR
+	saveZipFile(zip, directory + "capture_" + name + ".mp4", videoOut)
 	
-	# Read the image into memory for the thread image buffer
-	vidThumb = Image.open(imagefile.name)
-	image = BytesIO()
-	vidThumb.save(image, format='PNG')
-	screenshot = image.getvalue()
+	# Read the first frame into memory for the thread image buffer
+	with open(thumbnail, 'rb') as file:
+		screenshot = file.read()
 	
 	# Save this composited image to the zip
 	saveZip(zip, directory + "capture_" + name + ".png", screenshot)
 	
-	#log.debug("Testing link printout")
-	# TODO FUTURE FEATURE: get links to every video, like with images
-	#mediaInfo['videos']
-	#vids = await tweetVideo.all()
-	#vidsJSON = {}
-	#for vid in vids:
-	#	# We'll have to clean up the url, but this will give us what we need
-	#	log.debug("\n\tall vids:")
-	#	vidtext = await vid.text_content()
-	#	print(vid)
-	#	print(vidtext)
-	#	print("----")
-	#	for vi in await vid.all():
-	#		log.debug("\n\tvi:")
-	#		print(vi)
-	#		vidURL = await vi.get_attribute("src")
-	#		if vidURL is not None:
-	#			log.debug("src = " + vidURL)
-	
-	# TODO future feature: better video metadata
-	#mediaInfo['video2'] = []
-	#mediaInfo['videos'].append('')
-	
-	### TODO CRIT RELEASE: test getting links
-	#vids = await tweetPhoto.all()
-	#imagesJSON = {}
-	# TODO: see; what I do in the image link grabber
-	#for image in images:
-	
-	# TODO FUTURE FEATURE:
-	### GIF detection & processing
-	# For the sake of making a gif tweet just exist as a gif, let's cut the bullshit and do it for you
-	# This can also be accomplished via some ffmpeg wizardry
-	# TODO POLISH: toggle-able algorithm to optimize GIF for a target file size for sharing on platforms such as discord
-	videotext = await tweetVideo.text_content()
-	if videotext == "GIF": # This is broken in chrome! it works in firefox but there are other problems with firefox in playwright!
-		print("This tweet is a GIF! tweetinstone cannot auto-convert GIFs at this time")
-		
-		# TODO FUTURE: do this ffmpeg magic but in python
-		#ffmpeg -loglevel quiet -i input.mp4 -vf "fps=$FRAMERATE,scale=$WIDTH:-1:flags=lanczos,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse" -loop 0 output.mp4
-		
-		# TODO POLISH: have support for and options for gif optimization techniques
-		#gifsicle -O3 --lossy=$LOSSYLEVEL -o temporary-lossy.gif input.mp4
-		
-		# TODO OPTION: have some sort of timeout option based on video length/size?
-	
-	log.debug("Video capture done")
-	return (True, screenshot)
+	log.debug("Composite of '" + name + "' done")
+	return screenshot
+
+### finish_videos(): wait for a search's videos that are being composited in the background, and put their first frames into the search's image
+# Each video reports its own failure. Returns whether all of them were successful
+async def finish_videos(search: dict) -> bool:
+	from PIL import Image # For handling images
+	
+	log = logging.getLogger(__name__)
+	
+	successful = True
+	for (offset, name, encode) in search['encodes']:
+		try:
+			frame = await encode
+		except EncodeError as error:
+			log.error("Compositing the video of '" + name + "' failed: " + str(error))
+			log.error("ffmpeg error output:" + error.stderr)
+			successful = False
+			continue
+		
+		# The masked screenshot was put in the search's image at 'offset' while this was running, and the first frame is the same size
+		with Image.open(BytesIO(frame)) as image:
+			search['image'].paste(image, (0, offset))
+	
+	search['encodes'] = []
+	return successful
+
+### cancel_videos(): stop compositing a search's videos, for when the search has failed anyway
+async def cancel_videos(search: dict) -> None:
+	for (offset, name, encode) in search['encodes']:
+		encode.cancel()
+	await asyncio.gather(*[encode for (offset, name, encode) in search['encodes']], return_exceptions=True)
+	search['encodes'] = []
+
+### tweet_metadata(): everything capture() reads from a tweet, from a single evaluation in the page
+# Asking playwright about each button, stat, link and image separately costs a round trip to the browser apiece, which adds up to dozens per tweet
+# - 'buttons':  the text of each button, in the same order as tweet.get_by_role("button")
+# - 'stats':    the count and the text of the first of each stat button, keyed by test ID (see capture_stats())
+# - 'times':    the datetime of each time, in order; QRTs have the inner tweet's time first
+# - 'texts':    the html and the text of each 'tweetText'; QRTs have the outer tweet's text first
+# - 'links':    the href of each link
+# - 'authors':  the text of each 'User-Name', more than one of which means it's a QRT
+# - 'articles': the text of each article inside the tweet, such as an unavailable quoted tweet
+# - 'photos':   the src and alt of the image in each 'tweetPhoto', and whether it's actually a video's thumbnail
+# - 'videos':   how many video players there are, and 'videotext' the text of the first
+async def tweet_metadata(tweet: Locator) -> dict:
+	return await tweet.evaluate(metadata_script)
+
+# The script behind tweet_metadata()
+# Hidden buttons and links are skipped the same way playwright's get_by_role() skips them, so that the indexes line up
+metadata_script = """
+(tweet) => {
+	const visible = (element) => element.getClientRects().length > 0 && element.closest('[aria-hidden="true"]') === null;
+	const all = (selector) => Array.from(tweet.querySelectorAll(selector));
+	
+	const stats = {};
+	for (const testid of ["reply", "retweet", "unretweet", "like", "unlike", "bookmark", "removeBookmark"]) {
+		const buttons = all('[data-testid="' + testid + '"]');
+		stats[testid] = {count: buttons.length, text: buttons.length > 0 ? buttons[0].innerText : ""};
+	}
+	
+	const players = all('[data-testid="videoPlayer"]');
+	
+	return {
+		buttons: all('button, [role="button"]').filter(visible).map((button) => button.textContent),
+		stats: stats,
+		times: all('time').map((time) => time.getAttribute('datetime')),
+		texts: all('[data-testid="tweetText"]').map((text) => ({html: text.innerHTML, text: text.textContent})),
+		links: all('a[href], [role="link"]').filter(visible).map((link) => link.getAttribute('href')),
+		authors: all('[data-testid="User-Name"]').map((author) => author.textContent),
+		articles: all('article, [role="article"]').map((article) => article.textContent),
+		photos: all('[data-testid="tweetPhoto"]').map((photo) => {
+			const image = photo.querySelector('img');
+			return {
+				video: photo.querySelector('[data-testid="videoPlayer"]') !== null,
+				src: image !== null ? image.getAttribute('src') : null,
+				alt: image !== null ? image.getAttribute('alt') : null,
+			};
+		}),
+		videos: players.length,
+		videotext: players.length > 0 ? players[0].textContent : null,
+	};
+}
+"""
+
+### start_video_download(): start downloading a tweet's video in the background, so that the rest of the tweet can be captured while it downloads
+# 'url' is the tweet's own url
+# Returns the scratch directory the video is downloaded to (see takeVideoFile()) and the future (from submit_video()) that finishes with takeVideoFile()'s result
+def start_video_download(args, url: str) -> tuple:
+	log = logging.getLogger(__name__)
+	log.debug("Starting video download in the background")
+	
+	# Reference: https://docs.python.org/3/library/tempfile.html
+	scratch = tempfile.TemporaryDirectory(prefix="tis_video_")
+	future = submit_video(takeVideoFile, args.cookies, mirror_url(args.mirror, url), scratch.name)
+	return (scratch, future)
+
+### discard_video_download(): throw away a video download that won't be used, once it's finished
+# A download running on a thread can't be stopped partway through, so the scratch directory is only removed once the thread is done with it
+def discard_video_download(download: tuple) -> None:
+	(scratch, future) = download
+	future.cancel() # Which only works if it hasn't started yet
+	future.add_done_callback(lambda finished: scratch.cleanup())
 
 # TODO FUTURE: POLISH with metadata on single
 # Captures the blank boxes that indicate deleted/inaccessable tweets
@@ -521,8 +639,7 @@ async def deleted_capture(search: dict, tweet: Locator, url: str, errormessage:
 	log = logging.getLogger(__name__)
 	
 	# Since the tweet doesn't have data in it, guess based on the url
-	handle =  url.split('/')[3]
-	id = url.split('/')[5].split('?')[0]
+	(handle, id) = parseTweetURL(url)
 	name = handle + "_" + id
 
 	print(' - Capturing tweet #' + str(search['current_tweet_iterator']) + ' (Deleted with message: "' + errormessage + '")')
@@ -549,7 +666,7 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 	progress_callback.emit((0, search['current_tweet_iterator'], handle + "/status/" + id, 4, None))
 	
 	# Directory for where we save files in the zip
-	if search['current_tweet_iterator'] == 1 and search['args'].thread == False and search['target'].split('/')[5].split('?')[0] == id:
+	if search['current_tweet_iterator'] == 1 and search['args'].thread == False and search['id'] == id:
 		# If this is the first tweet being captured 
 		# AND we aren't grabbing a thread
 		# AND it matches the tweet at the very beginning of the search
@@ -585,20 +702,26 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 	tweetInfo['id']     = id
 	tweetInfo['url']    = "https://twitter.com/" + tweetInfo['author'] + "/status/" + tweetInfo['id']
 	
+	videodownload = None
 	try:
 		translated = False
 		
+		# Everything to be read from the tweet is read in one go, instead of asking the browser about each part of it separately
+		with search['timer'].span("metadata", id):
+			metadata = await tweet_metadata(tweet)
+		
+		# A video takes the longest of anything to download, so it's started right away and left to download while everything else is captured
+		if metadata['videos'] == 1:
+			videodownload = start_video_download(search['args'], tweetInfo['url'])
+		
 		# Detect and click the buttons to view content and/or translate posts
-		buttons = await tweet.get_by_role("button").all()
-		for button in buttons:
-			if button is not None:
-				# Sometimes the last button disappears and causes the search to bug out
-				# Ignore this
-				try:
-					buttontext = await button.text_content(timeout=3000)
-				except PlaywrightTimeoutError:
-					break
-				
+		span = search['timer'].start("buttons", id)
+		clicked = False
+		for buttontext in metadata['buttons']:
+			# Clicking a button can add or remove other buttons, so they're found by their text rather than by their position in the list
+			# A button that's been clicked changes its text (such as 'Show' to 'Hide'), so the first one with this text is always one that hasn't been
+			button = tweet.get_by_role("button").filter(has_text=re.compile("^" + re.escape(buttontext) + "$")).first
+			if buttontext in ("Translate post", "View", "Show"):
 				# Translate tweets
 				# Limitation: Translations only work when you have cookies
 				#if hasattr(search['args'], 'cookie'):
@@ -607,11 +730,13 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 						await button.click()
 						log.debug("Pushed 'Translate post' button")
 						translated = True
+						clicked = True
 						#break
 				
 				if buttontext == "View":
 					await button.click()
 					log.debug("Pushed 'view sensitive content' button")
+					clicked = True
 					#break
 				
 				# Detect content warning
@@ -622,6 +747,7 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 					
 					await button.click()
 					log.debug("Pushed 'view content warning' button")
+					clicked = True
 					
 					aftertext = await tweet.inner_text()
 					
@@ -643,20 +769,30 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 								break
 					#break
 		
+		# Clicking those buttons changes what's in the tweet, so read it again
+		if clicked:
+			# The translation is loaded in after the button is pushed, so wait for it to show up first
+			if translated:
+				await tweet.get_by_test_id("tweetText").nth(1).wait_for()
+			with search['timer'].span("metadata", id):
+				metadata = await tweet_metadata(tweet)
+		
+		span.stop()
+		
 		# Use the 'last' time because QRTs have the inner tweet's time first
-		tweetInfo['time']   = await tweet.get_by_role("time").last.get_attribute('datetime')
+		span = search['timer'].start("text", id)
+		tweetInfo['time']   = metadata['times'][-1] if len(metadata['times']) > 0 else None
 		
 		# Grab the raw text from the tweet too, which may or may not exist
-		textSearch      = tweet.get_by_test_id("tweetText")
-		tweetTextCount  = await textSearch.count()
-		if tweetTextCount > 0:
+		tweetTexts = metadata['texts']
+		if len(tweetTexts) > 0:
 			# These are the old way of grabbing text info:
 			#tweetInfo['text'] = await textSearch.first.text_content()
 			#tweetInfo['text'] = await textSearch.first.inner_text()
 			
 			# Grab the HTML from playwright
 			# Must be first because QRTs have text of both
-			tweetHTML = await textSearch.first.inner_html()
+			tweetHTML = tweetTexts[0]['html']
 			
 			cleanedText = capture_text(tweetHTML)
 			
@@ -666,24 +802,28 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 			
 			# Attempt to fetch translation
 			if translated:
-				tweetHTML = await textSearch.nth(1).inner_html()
+				tweetHTML = tweetTexts[1]['html']
 				
 				cleanedText = capture_text(tweetHTML)
 				
 				# Save the 'clean' html and text to the json
 				tweetInfo['translation'] = {'text': cleanedText['text'], 'html': cleanedText['html']}
 		
+		span.stop()
+		
 		# Get all t.co links
-		tweetInfo['links'] = await capture_links(tweet, handle, id)
+		with search['timer'].span("links", id):
+			tweetInfo['links'] = await capture_links(metadata['links'], handle, id, search['args'])
 		
 		### QRT Metadata Capture ###
 		# Detect if it's a QRT and grab relevant QRT metadata
-		tweetAuthorCount  = await tweet.get_by_test_id("User-Name").count()
-		tweetArticleCount = await tweet.get_by_role("article").count()
+		span = search['timer'].start("quote", id)
+		tweetAuthorCount  = len(metadata['authors'])
+		tweetArticleCount = len(metadata['articles'])
 		
 		quoteInfo = {}
 		if tweetAuthorCount > 1:
-			quoteInfo['author'] = (await tweet.get_by_test_id("User-Name").last.text_content()).split('@')[1].split(u'\u00b7')[0]
+			quoteInfo['author'] = metadata['authors'][-1].split('@')[1].split(u'\u00b7')[0]
 			
 			# Grab the URL by going to the page since a real 'link' doesnt exist in the html
 			await tweet.get_by_test_id("User-Name").last.click(position={'x': 1,'y': 1}) 
@@ -702,19 +842,17 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 			# Return to our original tweet
 			await tweet.page.go_back(wait_until='domcontentloaded')
 			
-			quoteInfo['id']   = quoteURL.split('/')[5].split('?')[0]
+			quoteInfo['id']   = parseTweetURL(quoteURL)[1]
 			quoteInfo['url']  = "https://twitter.com/" + quoteInfo['author'] + "/status/" + quoteInfo['id']
-			quoteInfo['time'] = await tweet.get_by_role("time").first.get_attribute('datetime')
+			quoteInfo['time'] = metadata['times'][0] if len(metadata['times']) > 0 else None
 			
 			# TODO FUTURE POLISH: do I need to do better parsing with html for quote tweets?
-			quoteInfo['text'] = await textSearch.last.text_content()
+			quoteInfo['text'] = tweetTexts[-1]['text'] if len(tweetTexts) > 0 else None
 			
 			# Put this quote tweet info into the tweet's metadata
 			tweetInfo['quoting'] = quoteInfo
 		elif tweetArticleCount > 0: # Detect deleted, suspended, or private tweets
-			articles = await tweet.get_by_role("article").all()
-			for article in articles:
-				articletext = await article.text_content()
+			for articletext in metadata['articles']:
 				if articletext == "This post is unavailable.":
 					quoteInfo['id'] = 'unavailable'
 					quoteInfo['text'] = articletext
@@ -725,14 +863,14 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 				#	quoteInfo['text'] = articletext
 				#	tweetInfo['quoting'] = quoteInfo
 		
+		span.stop()
+		
 		# TODO FUTURE POLISH?
 		# Detect the type of inner article that shows up with the learn more box
 		
 		### Media detection and capture ###
-		tweetPhoto = tweet.get_by_test_id("tweetPhoto")
-		tweetVideo = tweet.get_by_test_id("videoPlayer") # Detect if there is a video (Also used to mask it out of the screenshot with this locator)
-		tweetVideoCount = await tweetVideo.count()
-		tweetPhotoCount = await tweetPhoto.count()
+		tweetVideoCount = metadata['videos']
+		tweetPhotoCount = len(metadata['photos'])
 		
 		log.debug("### MEDIA DETECTION ###")
 		log.debug("Videos detected: " + str(tweetVideoCount))
@@ -742,7 +880,9 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 		# If there's a SINGLE video, composite the video into the tweet
 		#if tweetVideoCount > 0: # TODO FUTURE FEATURE: change back to this when video + image and multivideo works
 		if tweetVideoCount == 1:
-			video_output = await capture_video(search['args'], search['zip'], tweet, directory, name, progress_callback)
+			# capture_video() takes care of the download from here, whatever happens
+			(download, videodownload) = (videodownload, None)
+			video_output = await capture_video(search['args'], search['zip'], tweet, tweetInfo['url'], directory, name, search['timer'], id, metadata['videotext'], search['store'], download, progress_callback)
 			
 			# TODO FUTURE OPTIMIZATION: any files needed to clean up?
 			if video_output[0] == False:
@@ -752,20 +892,25 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 				return output
 			screenshot = video_output[1]
 			
+			# The screenshot is about to be added to the bottom of the search's image, where the composite's first frame will replace it (see finish_videos())
+			search['encodes'].append((search['image'].height, name, video_output[2]))
+			
 			# TODO FUTURE FEATURE: better video metadata
 			mediaInfo['video'] = True
+			mediaInfo['encode'] = encode_settings(search['args'])
 			#mediaInfo['videos'] = []
 			#mediaInfo['videos'].append('')
 			
 			# Also capture images just in case there is one via QRTing
 			# TODO CRIT FUTURE FEATURE TEST AND POLISH
 			#if tweetPhotoCount > tweetVideoCount:
-			#	mediaInfo['images'] = await capture_images(search['zip'], tweet, tweetInfo, directory)
+			#	mediaInfo['images'] = await capture_images(search['zip'], metadata['photos'], tweetInfo, directory, search['timer'])
 		elif tweetPhotoCount > tweetVideoCount:
 			# There are more (# of photos + videos) than (# of videos), so capture all photos
-			mediaInfo['images'] = await capture_images(search['zip'], tweet, tweetInfo, directory)
+			mediaInfo['images'] = await capture_images(search['zip'], metadata['photos'], tweetInfo, directory, search['timer'], search['args'].mirror, search['store'], search['media'])
 			
-			screenshot = await tweet.screenshot(scale="device")
+			with search['timer'].span("screenshot", id):
+				screenshot = await tweet.screenshot(scale="device")
 			
 			# As long as we don't want JUST this tweet, save the image to file
 			# This is because the 'thread' image will be effectively the same for a single tweet
@@ -776,7 +921,8 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 		else:
 			# No media detected
 			# Just grab the screenshot and no other files
-			screenshot = await tweet.screenshot(scale="device")
+			with search['timer'].span("screenshot", id):
+				screenshot = await tweet.screenshot(scale="device")
 			
 			# As long as we don't want JUST this tweet, save the image to file
 			# This is because the 'thread' image will be effectively the same
@@ -787,7 +933,8 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 		tweetInfo['media'] = mediaInfo
 		
 		# Get stats
-		tweetInfo['stats'] = await capture_stats(tweet)
+		with search['timer'].span("stats", id):
+			tweetInfo['stats'] = capture_stats(metadata['stats'])
 		
 		# Put all tweet metadata in one object
 		tweetMetadata = {"tis": tisInfo, "tweet": tweetInfo}
@@ -805,6 +952,7 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 		return output
 	except PlaywrightTimeoutError as error:
 		log.error("Timeout during capture of '" + handle + "/status/" + id + "'")
+		
 		await killshot(search, tweet.page)
 		
 		output = {}
@@ -816,4 +964,8 @@ async def capture(search: dict, tweet: Locator, handle: str, id: str, progress_c
 		# TODO RELEASE: raise error fully when in debug mode?
 		#raise
 		
-		return output
\ No newline at end of file
+		return output
+	finally:
+		# A video that was being downloaded but never composited (e.g. it went away after a button was pushed, or the capture failed) isn't needed after all
+		if videodownload is not None:
+			discard_video_download(videodownload)
\ No newline at end of file
@@ -0,0 +1,116 @@
+### encode.py
+# Running ffmpeg and ffprobe without holding anything else up
+# Each run is a subprocess driven by asyncio, so the web browser (and every other search) carries on while it encodes,
+# and only so many encodes run at once ('--encode-jobs') so that a batch full of videos doesn't swamp the machine
+
+import os
+import json
+import asyncio
+import logging
+
+from weakref import WeakKeyDictionary
+
+# ffmpeg-python is only used to build the command lines, and is imported by whoever builds them
+
+# The encodes allowed at once, for each event loop (the GUI runs a new event loop for each search)
+slots = WeakKeyDictionary()
+
+### Encode profiles
+# How composited videos are encoded, trading encode time and file size against quality
+# - 'preset' and 'crf': x264's speed preset and quality (lower is better, and bigger). Reference: https://trac.ffmpeg.org/wiki/Encode/H.264
+# - 'audio':    'copy' to keep the original audio as it is, or a bitrate to re-encode it to AAC at
+# - 'threads':  how many threads each encode uses, or None for its share of the CPU cores (see '--encode-jobs')
+# - 'maxwidth': the widest the composite is saved at, or None for the full size of the screenshot ('--scale')
+#   Tweets are always the same width in the web browser, so this caps the size of every composite the same way
+encodeprofiles = {
+	# Small files, quickly; about 720p
+	'fast': {
+		'preset': 'veryfast',
+		'crf': 28,
+		'audio': '96k',
+		'threads': None,
+		'maxwidth': 1280,
+	},
+	# About 1080p, with x264's usual settings
+	'balanced': {
+		'preset': 'medium',
+		'crf': 23,
+		'audio': 'copy',
+		'threads': None,
+		'maxwidth': 1920,
+	},
+	# Every pixel of the screenshot, at close to the original's quality
+	'archival': {
+		'preset': 'slow',
+		'crf': 18,
+		'audio': 'copy',
+		'threads': None,
+		'maxwidth': None,
+	},
+}
+
+### EncodeError: ffmpeg or ffprobe failed
+# 'stderr' is what it had to say about it
+class EncodeError(Exception):
+	def __init__(self, message: str, stderr: str = ""):
+		super().__init__(message)
+		self.stderr = stderr
+
+### encode_slots(): the semaphore that limits how many encodes run at once
+def encode_slots(args) -> asyncio.Semaphore:
+	loop = asyncio.get_running_loop()
+	if loop not in slots:
+		slots[loop] = asyncio.Semaphore(max(1, args.encode_jobs))
+	return slots[loop]
+
+### encode_settings(): the settings of the encode profile in use, for recording alongside the video
+def encode_settings(args) -> dict:
+	settings = {'profile': args.encode_profile}
+	settings.update(encodeprofiles[args.encode_profile])
+
+	if settings['threads'] is None:
+		settings['threads'] = max(1, (os.cpu_count() or 1) // max(1, args.encode_jobs))
+
+	return settings
+
+### encode_options(): ffmpeg-python output options for encoding a video with these settings (see encode_settings())
+def encode_options(settings: dict) -> dict:
+	options = {'vcodec': 'libx264', 'preset': settings['preset'], 'crf': settings['crf'], 'threads': settings['threads']}
+
+	if settings['audio'] == 'copy':
+		options['acodec'] = 'copy'
+	else:
+		options['acodec'] = 'aac'
+		options['audio_bitrate'] = settings['audio']
+
+	return options
+
+### run_process(): run a command to completion, returning its stdout
+# Raises EncodeError if it fails
+async def run_process(command: list) -> bytes:
+	process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+	try:
+		(stdout, stderr) = await process.communicate()
+	except asyncio.CancelledError:
+		# Nobody is waiting on the result anymore, so don't leave it running
+		process.kill()
+		await process.wait()
+		raise
+
+	if process.returncode != 0:
+		raise EncodeError(command[0] + " exited with code " + str(process.returncode), stderr.decode("utf-8", errors="replace"))
+
+	return stdout
+
+### run_ffmpeg(): run an ffmpeg-python output stream once there's a free slot for it
+async def run_ffmpeg(args, stream) -> None:
+	log = logging.getLogger(__name__)
+
+	command = stream.compile(overwrite_output=True)
+	async with encode_slots(args):
+		log.debug("Running: " + ' '.join(command))
+		await run_process(command)
+
+### probe(): the streams and format of a media file, like ffmpeg.probe()
+async def probe(filename: str) -> dict:
+	return json.loads(await run_process(['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', filename]))
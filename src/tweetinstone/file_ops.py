@@ -5,8 +5,10 @@
 import logging
 import asyncio
 import time
-from PySide6.QtCore import Signal
+import shutil
 from zipfile import ZipFile # Used for the zips
+
+from tweetinstone.progress import Progress
 # TODO FUTURE: import boto3?
 
 # TODO FUTURE FEATURE: have all of these specify a different output directory if that directory is specified as argument!!!
@@ -44,6 +46,11 @@ def saveZip(zip: ZipFile, filename: str, data) -> None:
 def saveZipFile(zip: ZipFile, filename: str, file) -> None:
 	zip.write(file, arcname=filename)
 
+### saveZipStream(): Write a file-like object to zip at 'filename', a piece at a time instead of all at once
+def saveZipStream(zip: ZipFile, filename: str, stream) -> None:
+	with zip.open(filename, 'w') as entry:
+		shutil.copyfileobj(stream, entry)
+
 ### gen_cookie(): Generate a cookie file from an auth_token string
 def gen_cookie(auth_token: str, filename):
 	log = logging.getLogger(__name__)
@@ -61,7 +68,7 @@ def gen_cookie(auth_token: str, filename):
 
 ### check_progress_file(): asynchronous function to repeatedly check the last lines of an ffmpeg progress file
 # TODO FUTURE: consider optimizing this with the exponential search algorithm in https://www.geeksforgeeks.org/python-reading-last-n-lines-of-a-file/ ?
-async def check_progress_file(filename: str, progress_callback: Signal):	
+async def check_progress_file(filename: str, progress_callback: Progress):	
 	# Specify 3 of the progress values up front as variables
 	frame = "0"
 	fps = "0"
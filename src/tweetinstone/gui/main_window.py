@@ -11,7 +11,7 @@ from PySide6.QtCore import QDir, QStandardPaths, Qt, Signal, Slot, QThreadPool
 
 # Import TIS-specific functions
 from tweetinstone.version import __version__
-from tweetinstone.search import parser_setup
+from tweetinstone.arguments import parser_setup
 from tweetinstone.file_ops import gen_cookie
 from tweetinstone.text_ops import validURL
 from tweetinstone.gui.search_window import TweetDialog
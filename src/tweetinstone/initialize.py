@@ -1,25 +1,30 @@
 from __future__ import unicode_literals # Required for yt-dl
 
 # Import standard libraries
-import asyncio
 import logging
-from sys import exit # I only need exit from sys
-from PySide6.QtWidgets import QApplication # Used because the GUI setup happens here regardless
+from sys import exit, argv # I only need exit and the raw arguments from sys
 
 # Import tweetinstone-specific functions
+# Only what every run needs is imported up here. The GUI (Qt), the web browser and the media libraries are imported by the branch that uses them,
+# so that '--help', '--generate' and containers without Qt installed don't wait on (or need) any of them
 from tweetinstone.file_ops import gen_cookie
-from tweetinstone.search import parser_setup, read_input, run_playwright
-from tweetinstone.gui.main_window import tis_main_window, stylesheet
-from tweetinstone.gui.worker import WorkerSignals
+from tweetinstone.arguments import parser_setup
+from tweetinstone.progress import Progress
 
 ### initialize(): AKA a synonym for main() since I needed to make some nested mains
 # Gets args, then based off of that does the real shit
 async def initialize(forcegui) -> None:
+	# Subcommands are checked for by hand, since a positional subcommand would get mixed up with the tweet urls
+	arguments = argv[1:]
+	command = None
+	if len(arguments) > 0 and arguments[0] in ('batch', 'serve', 'export'):
+		command = arguments.pop(0)
+	
 	# Set up argument parser
-	parser = parser_setup()
+	parser = parser_setup(command)
 	
 	# Parse the arguments
-	args = parser.parse_args()
+	args = parser.parse_args(arguments)
 	
 	### Logging setup
 	# TODO FUTURE: option to log to a file
@@ -31,6 +36,12 @@ async def initialize(forcegui) -> None:
 	
 	log = logging.getLogger(__name__)
 	
+	# Exporting archives has nothing to do with searching (or the GUI), so it's done and over with first
+	if command == 'export':
+		from tweetinstone.media_store import export_archives
+		
+		exit(export_archives(args))
+	
 	# TODO FUTURE: optimize?
 	# Check if GUI is forced regardless of CLI (this I added when creating `tis-gui` option during package creation)
 	if forcegui:
@@ -40,6 +51,9 @@ async def initialize(forcegui) -> None:
 	if args.gui:
 		log.debug("Launching GUI")
 		
+		from PySide6.QtWidgets import QApplication
+		from tweetinstone.gui.main_window import tis_main_window, stylesheet
+		
 		app = QApplication([])
 		
 		window = tis_main_window()
@@ -67,14 +81,30 @@ async def initialize(forcegui) -> None:
 			
 			gen_cookie(token, filename)
 			print("Saved cookie file to '" + str(filename) + "'")
+		elif command == 'serve': # Keep the browser open and take searches over HTTP
+			from tweetinstone.serve import run_server
+			
+			await run_server(args)
 		elif not args.input and len(args.urls[0]) == 0:	# Print help message if no url or list provided
 			parser.parse_args(['-h'])
-		else: # Run the search on the url(s)
+		elif command == 'batch': # Split the search across worker processes
+			from tweetinstone.search import read_input, streaming_input
+			from tweetinstone.batch import run_batch
+			
+			# Sharding needs the whole list up front
+			if streaming_input(args):
+				parser.error("'tis batch' needs a complete list of urls, so it can't read from stdin or follow a file")
+			
 			urls = read_input(args)
 			
-			# Create signals with class even if we aren't using it
-			# TODO FUTURE: use it?
-			signals = WorkerSignals()
+			await run_batch(args, urls)
+		else: # Run the search on the url(s)
+			from tweetinstone.search import read_input, stream_input, streaming_input, run_playwright
+			
+			if streaming_input(args):
+				urls = stream_input(args)
+			else:
+				urls = read_input(args)
 			
 			# Run all the playwright stuff based off of the arguments provided
-			await run_playwright(args, urls, signals.progress)
\ No newline at end of file
+			await run_playwright(args, urls, Progress())
\ No newline at end of file
@@ -0,0 +1,52 @@
+### journal.py
+# An on-disk record of each search in a batch, so that a run that dies partway through can be resumed
+# SQLite is used so that every write is committed as soon as it happens, and so that 'tis batch' worker processes can share the same file
+
+import sqlite3
+import logging
+
+from datetime import datetime
+
+### Journal: the state and output of each url in a batch
+# States are 'pending' (queued), 'running', 'done' and 'failed'
+class Journal:
+	def __init__(self, filename: str):
+		self.log = logging.getLogger(__name__)
+		self.filename = filename
+
+		# Autocommit, since the whole point is that nothing is lost when the process dies
+		# The generous timeout is for when several worker processes write at once
+		self.connection = sqlite3.connect(filename, timeout=30, isolation_level=None)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS searches (url TEXT PRIMARY KEY, state TEXT NOT NULL, archive TEXT, updated TEXT NOT NULL)")
+
+		self.log.debug("Using search journal '" + filename + "'")
+
+	### mark(): record the current state of a url
+	def mark(self, url: str, state: str, archive: str = None) -> None:
+		updated = timestamp()
+		self.connection.execute("INSERT OR REPLACE INTO searches (url, state, archive, updated) VALUES (?, ?, ?, ?)", (url, state, archive, updated))
+
+	### completed(): the urls that have already been captured successfully
+	# 'since' limits it to the ones captured since then (a time from timestamp())
+	def completed(self, since: str = None) -> set:
+		if since is None:
+			rows = self.connection.execute("SELECT url FROM searches WHERE state = 'done'")
+		else:
+			rows = self.connection.execute("SELECT url FROM searches WHERE state = 'done' AND updated >= ?", (since,))
+		return set(row[0] for row in rows)
+
+	def close(self) -> None:
+		self.connection.close()
+
+### timestamp(): the current time, as the journal records it
+def timestamp() -> str:
+	return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+### open_journal(): open the journal for a search if one is wanted
+# Searches from a file (or ones being resumed) get a journal; a quick one-off url doesn't need one
+def open_journal(args):
+	if args.input or args.resume:
+		return Journal(args.journal)
+	else:
+		return None
@@ -1,19 +1,22 @@
 ### Media Operations ###
 # Functions that deal with video or images
 
+import os
 import logging
-from PIL import Image # Used for image operations. # Reference: https://pillow.readthedocs.io/en/stable/reference/Image.html
 
-from io import BytesIO, StringIO # Used for storing stuff in memory instead of temporary files where feasible
-from contextlib import redirect_stdout, redirect_stderr # Used for wacky bullshit
-from yt_dlp import YoutubeDL, DownloadError # yt-dlp used for youtube video download. Reference: https://github.com/yt-dlp/yt-dlp#embedding-yt-dlp
+from io import BytesIO # Used for storing stuff in memory instead of temporary files where feasible
 
-from sys import getsizeof
+# PIL and yt-dlp are imported by the functions that use them, since yt-dlp in particular takes a while to load and most tweets don't have a video
+
+# How many bytes of a video are read at a time as it's downloaded
+videobuffer = 1048576
 
 ### concatenate(): Combine two images vertically
 # Used for making threads into one big image by concatenating to the same Image object during recursion
 # The 'bottom' image is raw bytes which get added below the 'origin' PIL Image object's image
-def concatenate(origin: Image, bottom: bytes) -> Image:
+def concatenate(origin: "Image", bottom: bytes) -> "Image":
+	from PIL import Image # Used for image operations. # Reference: https://pillow.readthedocs.io/en/stable/reference/Image.html
+	
     # Open the byte stream as an image to get stats
 	bottomImage = Image.open(BytesIO(bottom))
 	
@@ -32,6 +35,8 @@ def concatenate(origin: Image, bottom: bytes) -> Image:
 ### takeVideo(): Download the video to a file and return that filename
 # Useful reference: https://github.com/ytdl-org/youtube-dl/tree/master#embedding-youtube-dl
 def takeVideo(url: str) -> str:
+	from yt_dlp import YoutubeDL # yt-dlp used for youtube video download. Reference: https://github.com/yt-dlp/yt-dlp#embedding-yt-dlp
+	
 	handle  = url.split("/")[3]
 	tweetid = url.split('/')[5].split('?')[0]
 	
@@ -53,46 +58,45 @@ def takeVideo(url: str) -> str:
 	# Return the name of the file for future manipulation
 	return outputname
 
-# TODO FUTURE: optimize
-### TakeVideoBytes(): download video from a url to a bytesio object
-async def takeVideoBytes(cookiefile, url: str) -> (int, BytesIO):
-	# Output to stdout, which we redirect into a BytesIO so that it doesn't touch the filesystem until we're ready
-	# Kudos to https://github.com/ytdl-org/youtube-dl/issues/17379#issuecomment-521804927
+### takeVideoFile(): download video from a url to a file in 'directory'
+# yt-dlp writes the video to disk a piece at a time as it downloads, so memory use doesn't grow with the size of the video
+# Returns the status (0 if successful), the name of the file, which is shared by everything that needs the video,
+# and the width and height of the video as yt-dlp reported them (None if it didn't), so they don't have to be probed for
+# Blocking, so it's run in the background on a thread (see start_video_download() in capture.py)
+def takeVideoFile(cookiefile, url: str, directory: str) -> (int, str, tuple):
+	from yt_dlp import YoutubeDL, DownloadError # yt-dlp used for youtube video download. Reference: https://github.com/yt-dlp/yt-dlp#embedding-yt-dlp
+	
 	log = logging.getLogger(__name__)
 	
+	ydl_opts = {
+		'format': 'best',
+		# yt-dlp's output goes to the log rather than stderr, since this runs alongside everything else
+		'logger': ytdlp_logging(),
+		'quiet': True,
+		'noprogress': True,
+		'outtmpl': os.path.join(directory, 'video.%(ext)s'),
+		# Read the download in fixed-size pieces, rather than letting the buffer grow
+		'buffersize': videobuffer,
+		'noresizebuffer': True,
+		#'progress_hooks': [progresshook]
+	}
+	
 	if cookiefile is not None:
 		log.debug("Attempting video download with cookies")
-		ydl_opts = {
-			'format': 'best',
-			#'logger': ytdlp_logger(),
-			'quiet': True,
-			'outtmpl': '-',
-			'logtostderr': True,
-			#'progress_hooks': [progresshook],
-			'cookiefile': cookiefile.name # Uses the same cookie file
-		}
+		ydl_opts['cookiefile'] = cookiefile.name # Uses the same cookie file
 	else:
 		log.debug("Attempting video download without cookies")
-		ydl_opts = {
-			'format': 'best',
-			#'logger': ytdlp_logger(),
-			'quiet': True,
-			# TODO Optimization: test this
-			'logtostderr': True,
-			#'verbose': True,
-			'outtmpl': '-'
-			#'progress_hooks': [progresshook]
-		}
 	
-	video = BytesIO()
-	stdouterr = StringIO()
 	status = 0
+	filename = None
+	size = None
 	
 	try:
-		with redirect_stderr(stdouterr):
-			with redirect_stdout(video):
-				with YoutubeDL(ydl_opts) as ydl:
-					ydl.download([url])
+		with YoutubeDL(ydl_opts) as ydl:
+			info = ydl.extract_info(url, download=True)
+			filename = ydl.prepare_filename(info)
+			if info.get('width') and info.get('height'):
+				size = (info['width'], info['height'])
 	# TODO FUTURE: better handling of errors?
 	except DownloadError as DLError:
 		log.error("Search failed due to yt-dlp error")
@@ -100,20 +104,33 @@ async def takeVideoBytes(cookiefile, url: str) -> (int, BytesIO):
 		status = 1
 	
 	# Sometimes, for mysterious reasons, the video is empty without there being a ytdl error
-	# This will mean the bytesio object will be 'empty' (80 bytes, with value of "b''")
 	# If this happens, report that the download failed
-	vidsize = getsizeof(video)
-	log.debug("Video size: " + str(vidsize) + " bytes")
-	if status == 0 and vidsize == 80:
-		if str(video.getvalue()) == "b''":
+	if status == 0:
+		if filename is None or not os.path.isfile(filename) or os.path.getsize(filename) == 0:
 			log.error("The downloaded video was a failure for unknown reasons (returned empty)")
 			status = 1
+		else:
+			log.debug("Video size: " + str(os.path.getsize(filename)) + " bytes")
 	
 	# TODO FUTURE OPTION
 	# Error out if the video is too large for the current settings (also: this is a yt-dlp option)
 	
-	# Return the BytesIO buffer of the video
-	return (status, video)
+	return (status, filename, size)
+
+### ytdlp_logging: sends yt-dlp's output to the debug log
+# Its errors are reported by takeVideoFile() once the download has failed, so they're only debug output here too
+class ytdlp_logging:
+	def debug(self, msg):
+		logging.getLogger(__name__).debug("yt-dlp: " + msg)
+
+	def info(self, msg):
+		self.debug(msg)
+
+	def warning(self, msg):
+		self.debug(msg)
+
+	def error(self, msg):
+		self.debug(msg)
 
 # TODO FUTURE FEATURES:
 ### yt-dlp logger
@@ -0,0 +1,116 @@
+### media_store.py
+# A shared pool of media files, so that an image or video that turns up in many archives (such as a viral quoted tweet) is only kept once
+# Files in the pool are named by their sha256, and each archive holds a manifest of which file goes where in it instead of a copy of each one
+# 'tis export' puts the media back into archives, for when a self-contained one is needed
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+
+from zipfile import ZipFile
+
+## Import TIS-specific functions
+from tweetinstone.file_ops import saveZip, saveZipStream
+
+# The name of the manifest inside of an archive
+manifestname = "media_manifest.json"
+
+### MediaStore: a directory of media files named by their sha256, and the manifest for the archive currently being written
+class MediaStore:
+	def __init__(self, directory: str):
+		self.log = logging.getLogger(__name__)
+		self.directory = directory
+
+		# Where each file in the store goes in the archive: its path in the archive, and the sha256 and size of the file
+		self.manifest = {}
+
+	### blob_path(): where the file with this sha256 is kept
+	# Files are split up by the first two characters of their hash, so that no one directory ends up with too many files in it
+	def blob_path(self, sha256: str) -> str:
+		return os.path.join(self.directory, sha256[:2], sha256)
+
+	### save(): put a file in the store (unless it's already there), and record where it goes in the archive
+	# 'stream' is the file's contents, and 'sha256' its hash
+	def save(self, filename: str, stream, sha256: str) -> None:
+		path = self.blob_path(sha256)
+		if os.path.exists(path):
+			self.log.debug("'" + filename + "' is already in the media store")
+		else:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+
+			# Written under a temporary name first, so that another process saving the same file never sees half of it
+			with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=".tmp_", delete=False) as blob:
+				shutil.copyfileobj(stream, blob)
+			os.replace(blob.name, path)
+
+		self.manifest[filename] = {'sha256': sha256, 'size': os.path.getsize(path)}
+
+	### save_manifest(): write the manifest into the archive, if anything in it was put in the store
+	def save_manifest(self, zip: ZipFile) -> None:
+		if len(self.manifest) > 0:
+			saveZip(zip, manifestname, json.dumps({'store': os.path.abspath(self.directory), 'media': self.manifest}, indent=2))
+
+### open_media_store(): the media store for a search, if one is wanted
+# Each search gets its own, since the manifest is for that search's archive
+def open_media_store(args):
+	if args.media_store is not None:
+		return MediaStore(args.media_store)
+	else:
+		return None
+
+### export_archive(): write a self-contained copy of an archive to 'output', with its media put back in from the store
+# Returns whether it was successful
+def export_archive(archive: str, store: MediaStore, output: str) -> bool:
+	log = logging.getLogger(__name__)
+
+	with ZipFile(archive) as source:
+		# Archives saved without a media store are already self-contained
+		if manifestname not in source.namelist():
+			log.debug("'" + archive + "' has no media manifest, so it's copied as it is")
+			shutil.copyfile(archive, output)
+			return True
+
+		manifest = json.loads(source.read(manifestname))
+
+		missing = [filename for (filename, media) in manifest['media'].items() if not os.path.exists(store.blob_path(media['sha256']))]
+		if len(missing) > 0:
+			log.error("The media store '" + store.directory + "' is missing " + str(len(missing)) + " files for '" + archive + "', such as '" + missing[0] + "'")
+			return False
+
+		with ZipFile(output, 'w') as target:
+			for info in source.infolist():
+				if info.filename != manifestname:
+					with source.open(info) as entry:
+						saveZipStream(target, info.filename, entry)
+
+			for (filename, media) in manifest['media'].items():
+				with open(store.blob_path(media['sha256']), 'rb') as blob:
+					saveZipStream(target, filename, blob)
+
+	return True
+
+### export_archives(): 'tis export', which writes self-contained copies of archives that were saved with '--media-store'
+# Returns the exit code
+def export_archives(args) -> int:
+	log = logging.getLogger(__name__)
+
+	os.makedirs(args.output, exist_ok=True)
+	store = MediaStore(args.media_store)
+
+	failed = 0
+	for archive in args.archives:
+		output = os.path.join(args.output, os.path.basename(archive))
+		if os.path.abspath(output) == os.path.abspath(archive):
+			log.error("Exporting '" + archive + "' would overwrite it. Use '--output' to export to another directory")
+			failed += 1
+		elif export_archive(archive, store, output):
+			print("Exported '" + archive + "' to '" + output + "'")
+		else:
+			failed += 1
+
+	if failed > 0:
+		log.error(str(failed) + " of " + str(len(args.archives)) + " archives could not be exported")
+		return 1
+	return 0
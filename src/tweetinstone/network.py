@@ -0,0 +1,207 @@
+### network.py
+# Functions for controlling what the web browser loads, and measuring what it did load
+# x.com loads a lot that never shows up in a screenshot of a tweet: analytics beacons, ads, the trends sidebar, and video streams that yt-dlp downloads separately anyway
+
+from __future__ import annotations # So that playwright's types can be used in annotations without importing playwright
+
+import time
+import logging
+
+from typing import TYPE_CHECKING
+from fnmatch import fnmatch
+from urllib.parse import urlsplit
+
+# The network profiles are needed just to list them in '--help', so playwright itself is only imported once a page is being set up
+if TYPE_CHECKING:
+	from playwright.async_api import Page, Route
+
+### Network profiles
+# Each profile is a set of resource types and url patterns to deny, plus url patterns that are allowed regardless
+# Resource types are the ones playwright uses. Reference: https://playwright.dev/python/docs/api/class-request#request-resource-type
+# Patterns are shell-style wildcards matched against the full url
+profiles = {
+	# Load everything, like a normal web browser would
+	'full': None,
+	# Only load what ends up in the screenshot
+	'lean': {
+		'deny_types': ['media', 'texttrack', 'manifest', 'eventsource'],
+		'deny_patterns': [
+			# Video streams (yt-dlp downloads videos on its own, and the video is masked out of the screenshot)
+			'https://video.twimg.com/*',
+			# Analytics and client event logging
+			'https://*/i/api/1.1/jot/*',
+			'https://*/1.1/jot/*',
+			'https://*.google-analytics.com/*',
+			'https://www.googletagmanager.com/*',
+			'https://*.doubleclick.net/*',
+			# Ads
+			'https://ads-twitter.com/*',
+			'https://*.ads-twitter.com/*',
+			'https://ads-api.twitter.com/*',
+			'https://ads-api.x.com/*',
+			# The trends and 'who to follow' sidebar
+			'https://*/i/api/2/guide.json*',
+			'https://*/i/api/graphql/*/ExplorePage*',
+			'https://*/i/api/graphql/*/GenericTimelineById*',
+			'https://*/i/api/2/badge_count/*',
+		],
+		'allow_patterns': [],
+	},
+}
+
+### blocked(): whether a request should be blocked under a network profile
+def blocked(profile: dict, url: str, resource_type: str) -> bool:
+	for pattern in profile['allow_patterns']:
+		if fnmatch(url, pattern):
+			return False
+
+	if resource_type in profile['deny_types']:
+		return True
+
+	for pattern in profile['deny_patterns']:
+		if fnmatch(url, pattern):
+			return True
+
+	return False
+
+### apply_profile(): route every request the page makes through the network profile
+# 'cached' is for when the browser's disk cache should be kept working. Playwright turns the cache off for routed pages,
+# so instead the url patterns are handed to chromium to block itself (resource types can't be blocked this way)
+async def apply_profile(page: Page, name: str, meter, cached: bool = False) -> None:
+	log = logging.getLogger(__name__)
+	profile = profiles[name]
+
+	# Routing every request costs a round trip through playwright, so don't bother when nothing would be blocked
+	if profile is None:
+		return
+
+	if cached and meter.cdp is not None:
+		await meter.cdp.send("Network.setBlockedURLs", {'urls': profile['deny_patterns']})
+		log.debug("Using network profile '" + name + "' (url patterns only, to keep the cache)")
+		return
+
+	async def route_request(route: Route):
+		request = route.request
+		if blocked(profile, request.url, request.resource_type):
+			meter.blocked += 1
+			await route.abort()
+		else:
+			# Fall back instead of continuing, so that a mirror (see apply_mirror()) still gets the request
+			await route.fallback()
+
+	await page.route("**/*", route_request)
+	log.debug("Using network profile '" + name + "'")
+
+### mirror_url(): where a url is fetched from when everything is being sent to a mirror
+# The mirror is a local stand-in for x.com, t.co and pbs.twimg.com (such as the one the offline benchmark in tests/benchmark runs)
+# It serves 'https://host/path' at '[mirror]/host/path'. Without a mirror, urls are left alone
+def mirror_url(mirror: str, url: str) -> str:
+	if mirror is None:
+		return url
+	
+	split = urlsplit(url)
+	mirrored = mirror.rstrip('/') + "/" + split.netloc + split.path
+	if split.query != "":
+		mirrored += "?" + split.query
+	
+	return mirrored
+
+### apply_mirror(): send every request the page makes to the mirror instead
+# The page still thinks it's on x.com, so its urls, clicks and navigation work the same as they would for real
+# This must be applied before apply_profile(), since the last route added is the first one to see each request
+async def apply_mirror(page: Page, mirror: str) -> None:
+	from playwright.async_api import Error as PlaywrightError
+	
+	log = logging.getLogger(__name__)
+	
+	async def route_request(route: Route):
+		request = route.request
+		try:
+			# Redirects are handed back to the page as they are, so it follows them through the mirror too
+			response = await page.context.request.fetch(mirror_url(mirror, request.url), method=request.method, data=request.post_data_buffer, max_redirects=0)
+		except PlaywrightError:
+			await route.abort()
+			return
+		
+		await route.fulfill(response=response)
+	
+	await page.route("**/*", route_request)
+	log.debug("Sending every request to the mirror at '" + mirror + "'")
+
+### NetworkMeter: count the bytes a page transfers, and how long it took to load
+# Bytes come from chromium's devtools protocol, since playwright only knows the size of a request after asking for it again
+class NetworkMeter:
+	def __init__(self):
+		self.cdp = None
+		self.reset()
+
+	### attach(): start counting what the page loads
+	async def attach(self, page: Page) -> None:
+		from playwright.async_api import Error as PlaywrightError
+		
+		page.on("load", self.page_loaded)
+
+		try:
+			self.cdp = await page.context.new_cdp_session(page)
+			self.cdp.on("Network.loadingFinished", self.request_finished)
+			self.cdp.on("Network.loadingFailed", self.request_failed)
+			await self.cdp.send("Network.enable")
+		except PlaywrightError:
+			# The devtools protocol is chromium-only
+			logging.getLogger(__name__).debug("Unable to count bytes transferred in this browser")
+
+	### reset(): start counting again for the next url
+	def reset(self) -> None:
+		self.start = time.monotonic()
+		self.loaded = None
+		self.bytes = 0
+		self.requests = 0
+		self.blocked = 0
+
+	def request_finished(self, params: dict) -> None:
+		self.requests += 1
+		self.bytes += int(params.get('encodedDataLength', 0))
+
+	def request_failed(self, params: dict) -> None:
+		# Requests blocked by chromium itself (see apply_profile()) show up as failures with a reason
+		if params.get('blockedReason') is not None:
+			self.blocked += 1
+
+	def page_loaded(self, page) -> None:
+		# Only the first load after a reset is the url's own page load
+		if self.loaded is None:
+			self.loaded = time.monotonic() - self.start
+
+	### summary(): a line describing what was loaded for a url
+	def summary(self, url: str) -> str:
+		if self.loaded is None:
+			loadtime = "never finished loading"
+		else:
+			loadtime = "loaded in " + str(round(self.loaded, 2)) + "s"
+
+		return "'" + url + "' " + loadtime + ", " + str(round(self.bytes / 1048576, 2)) + " MB transferred over " + str(self.requests) + " requests (" + str(self.blocked) + " blocked)"
+
+### MediaCapture: fetches tweet images through the web browser, so that capture_images() doesn't have to download them separately
+# The browser's own request API shares its cookies and open connections, instead of opening new ones through a separate HTTP client. Used with '--reuse-media'
+# (The page itself only ever loads smaller versions of each image, never the full-size one that's archived, so those can't be reused as they are)
+# 'mirror' is where images are fetched from instead of pbs.twimg.com, if anywhere (see mirror_url())
+class MediaCapture:
+	def __init__(self, page: Page, mirror: str = None):
+		self.page = page
+		self.mirror = mirror
+
+	### fetch(): the body of an image, fetched through the browser
+	# Returns None if that didn't work, so that it can be downloaded some other way
+	async def fetch(self, url: str, timeout: float) -> bytes:
+		from playwright.async_api import Error as PlaywrightError
+
+		try:
+			response = await self.page.request.get(mirror_url(self.mirror, url), timeout=timeout * 1000)
+			if response.ok:
+				body = await response.body()
+				if len(body) > 0:
+					return body
+		except PlaywrightError as error:
+			logging.getLogger(__name__).debug("Couldn't fetch '" + url + "' through the browser: " + error.message)
+
+		return None
@@ -0,0 +1,10 @@
+### progress.py
+# The progress callback that searches report to when there's no GUI to show it
+# Searches call progress_callback.emit() with a tuple as they go (see update_progress() in gui/search_window.py for what it holds)
+# The GUI passes a Qt Signal instead, which has the same emit(), so nothing outside of the GUI needs Qt installed
+
+### Progress: a progress callback that goes nowhere
+# The command line already prints and logs its own progress
+class Progress:
+	def emit(self, progress: tuple) -> None:
+		pass
@@ -3,78 +3,29 @@
 
 import os
 import json
-import pathlib # used for managing paths to output files
+import time
+import asyncio
+import threading
 import logging
-import argparse
 
 from sys import exit
 from io import BytesIO
-from PIL import Image # Used for combining images in threads
-from copy import copy, deepcopy # Used for managing the json of arguments in a sane way
+from copy import copy
 from zipfile import ZipFile # Used for the zips
 from datetime import datetime
-from PySide6.QtCore import Signal
 from playwright.async_api import async_playwright, Error as PlaywrightError
 
 # Import stuff from TIS files
 from tweetinstone.version import __version__
-from tweetinstone.text_ops import validURL, commentFilter
+from tweetinstone.text_ops import validURL, commentFilter, parseTweetURL, canonicalURL
 from tweetinstone.file_ops import saveZip, saveTxt
 from tweetinstone.traversal import detect
-
-### args_setup():
-# Create and return arg parser
-def parser_setup() -> argparse.ArgumentParser:
-	### Manage command line arguments and help menu ###
-	# Some of these are commented out - they're features that don't exist yet, but theoretically might someday
-	parser = argparse.ArgumentParser(prog='tis', usage='%(prog)s [options] [url]', description="Automatically save screenshots and metadata of tweets", epilog="Good luck and happy archiving, -M")
-	
-	# TODO POLISH: reconsider making input and urls mutually exclusive
-	inputgroup = parser.add_argument_group(title='input options', description='either input an arbitrary number of urls or a file containing urls to search')
-	inputgroup.add_argument('urls', metavar='[url] or [url1 url2 ...]', type=str, nargs='*', help='a url (or a group of space-separated urls) of tweet(s)', action='append')
-	inputgroup.add_argument('-i','--input', metavar='[file.txt]', type=argparse.FileType('r'), help="the path to a file of line-separated urls", required=False, action='store')
-	
-	# `--only` and `--thread` are mutually exclusive because, duh!
-	#amountgroup = parser.add_mutually_exclusive_group()
-	# However, to better sort them I'll just put them in a regular group
-	amountgroup = parser.add_argument_group(title='scope options', description='options that restrict or expand how many tweets are grabbed (by default, %(prog)s grabs the tweet and everything it is replying to)')
-	amountgroup.add_argument('-o','--only', help="Only grab the specific tweet, not what it is replying to", required=False, action='store_true', default=False)
-	amountgroup.add_argument('-t','--thread', help="get every tweet in the user's thread (before and after the tweet)", required=False, action='store_true')
-	
-	# TODO FUTURE: Add these options?
-	#parser.add_argument('-r','--retweet', help="get the tweet a quote retweet is quoting", required=False, action='store_true')
-	#parser.add_argument('-a','--all-tweets', help="get ALL tweets visible from the first tweet; 'shotgun mode'", required=False, action='store_true')
-	
-	customgroup = parser.add_argument_group(title='customization options', description='web browser options that change the appearance of the output images/video')
-	
-	# Default is dark mode because I'm a gracious human
-	customgroup.add_argument('--color', help="set browser color scheme (default: dark)", required=False, action='store', default='dark', choices=['dark','light'])
-	
-	### DPI Scaling factor
-	# 1 is default css, I don't recommend going that low; at least use 2
-	# If you're curious about this, you can see the DPI scaling factor for various devices at: https://github.com/microsoft/playwright/blob/main/packages/playwright-core/src/server/deviceDescriptorsSource.json
-	customgroup.add_argument('-s','--scale', metavar='[integer]', type=int, help="DPI scaling factor (default: 4)", required=False, action='store', default=4)
-	
-	### Locale & Time Zone
-	# Not everyone lives on the east coast of the US? I'll believe that when I see it... but I'll make it easy for you to change this, if this matters to you
-	customgroup.add_argument('-l','--locale', metavar='[string]', type=str, help="set locale of the web browser   (default: en-US)", required=False, action='store', default="en-US")
-	customgroup.add_argument('--timezone', metavar='[string]', type=str, help="set time zone of the web browser (default: America/New_York)", required=False, action='store', default="America/New_York")
-
-	# Some basic default options
-	parser.add_argument('-v','--verbose', help="print debug information to stdout to see progress", action='store_true', default=False)
-	parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
-	parser.add_argument('-g','--gui', help="Launch with GUI", required=False, action='store_true')
-	
-	# TODO FUTURE FEATURE
-	#parser.add_argument('-d','--directory', metavar='[path/to/directory]', type=pathlib.Path, help="Save output files to a specific directory", required=False, action='store')
-	
-	# Not strictly required, but recommended
-	parser.add_argument('-c','--cookies', metavar='[file.txt]', type=argparse.FileType('r'), help="A file containing the session token for a user found in browser cookies", required=False, action='store')
-	parser.add_argument('--generate', metavar='[file.txt]',type=pathlib.Path, help="Prompts for the auth_token string and creates a cookie file from it at the specified file name", required=False, action='store')
-	# TODO FUTURE POLISH: implement default cookie usage when a cookie.txt file is present
-	#parser.add_argument('-n','--no-cookies', help="Don't use the default 'cookie.txt' file", required=False, action='store_true')
-
-	return parser
+from tweetinstone.capture import finish_videos, cancel_videos
+from tweetinstone.journal import open_journal
+from tweetinstone.media_store import open_media_store
+from tweetinstone.network import NetworkMeter, MediaCapture, apply_profile, apply_mirror
+from tweetinstone.progress import Progress
+from tweetinstone.timing import Timer, start_timings, print_timings
 
 ### read_input():
 # Get tweet urls based on either input methodology
@@ -86,25 +37,122 @@ def read_input(args) -> list:
 		# URL or URLs via STDIN
 		urls = args.urls[0]
 		
-	return urls
+	return list(dedupe_urls(args, urls))
+
+### streaming_input(): whether the urls should be read as they arrive instead of all at once
+# Reading from stdin ('-i -') or following a file means the full list isn't known up front (and may never end)
+def streaming_input(args) -> bool:
+	return args.input is not None and (args.follow or args.input.name == "<stdin>")
+
+### stream_input(): get tweet urls one at a time as they are read
+# Memory use stays the same no matter how long the list is, and urls can be searched while the list is still being written
+def stream_input(args):
+	return dedupe_urls(args, read_searchfile(args.input, args.follow))
+
+### dedupe_urls(): remove urls for tweets that are already in the list (or, optionally, already archived)
+# Messy lists often have the same tweet as both x.com and twitter.com links, or with different tracking junk on the end
+# Catching these here saves loading the whole page again for a tweet that's already been captured
+# This yields urls as it goes so that it works on streams too; only the tweet IDs seen so far are kept
+def dedupe_urls(args, urls):
+	log = logging.getLogger(__name__)
+	
+	seen = set()
+	skipped = 0
+	
+	for url in urls:
+		url = commentFilter(url)
+		if url == "":
+			continue
+		
+		tweet = parseTweetURL(url)
+		
+		# Invalid urls are kept so that they still get reported as failed searches
+		if tweet is None:
+			yield url
+			continue
+		
+		# Tweet IDs are unique across all of twitter, so they're all that's needed to spot a duplicate
+		if tweet[1] in seen:
+			log.debug("Skipping '" + url + "' since it's a duplicate of another url in the list")
+			skipped += 1
+			continue
+		seen.add(tweet[1])
+		
+		if args.skip_existing:
+			archive = archive_name(args, tweet[0], tweet[1])
+			if os.path.isfile(archive):
+				log.debug("Skipping '" + url + "' since '" + archive + "' already exists")
+				skipped += 1
+				continue
+		
+		yield url
+	
+	if skipped > 0:
+		log.info("Skipped " + str(skipped) + " duplicate or already archived urls")
 
 ### parse_searchfile(): Parse a file to search, returning an array of urls
 def parse_searchfile(file) -> list:
-	urls = []
-	
+	return list(read_searchfile(file, False))
+
+### read_searchfile(): read the urls in a file one line at a time
+# When following, this waits for more lines at the end of the file instead of stopping, like 'tail -f'
+def read_searchfile(file, follow: bool):
 	# Iterate through list of tweets in file
 	with file as f:
-		# Iterate line by line
-		lines = f.read().splitlines()
-		for line in lines:
+		partial = ""
+		
+		while True:
+			line = f.readline()
+			
+			if line == "":
+				if follow:
+					# Nothing new yet, so check again in a bit
+					time.sleep(1)
+					continue
+				else:
+					break
+			
+			# A line without a newline at the end of a followed file may still be getting written
+			if follow and not line.endswith("\n"):
+				partial += line
+				continue
+			line = partial + line
+			partial = ""
+			
 			# Filter out comments from that line
-			url = commentFilter(line)
+			url = commentFilter(line.rstrip("\r\n"))
 			if url != "":
-				# Append the 'real' url to the list
-				urls.append(url)
-				
-	# Return this filtered list
-	return urls
+				yield url
+
+### iterate_urls(): step through the urls to search without blocking the event loop
+# Lists are stepped through directly, but streams are read on a background thread since reading stdin (or waiting on a followed file) can block for as long as it wants
+async def iterate_urls(urls):
+	if isinstance(urls, list):
+		for url in urls:
+			yield url
+		return
+	
+	loop = asyncio.get_running_loop()
+	
+	# The thread waits for each url to be taken before reading the next, so only a line or so is ever held in memory
+	lines = asyncio.Queue(maxsize=1)
+	
+	def read_lines():
+		try:
+			for url in urls:
+				asyncio.run_coroutine_threadsafe(lines.put(url), loop).result()
+		finally:
+			# 'None' marks the end of the stream
+			asyncio.run_coroutine_threadsafe(lines.put(None), loop).result()
+	
+	# Daemon thread so that a blocked read doesn't stop the program from exiting
+	threading.Thread(target=read_lines, daemon=True).start()
+	
+	while True:
+		url = await lines.get()
+		if url is None:
+			break
+		yield url
 
 ### read_cookies(): Read and add cookies
 # Intent: similar end functionality to https://github.com/ytdl-org/youtube-dl/tree/master#how-do-i-pass-cookies-to-youtube-dl
@@ -176,8 +224,37 @@ def parse_cookies(args) -> list:
 	
 	return cookies
 
-### tweet_search():
-async def tweet_search(args, page, url: str, currenttweet: int, num_searches: int, progress_callback):
+### archive_name(): the filename of the zip that a search saves to, based off of the search mode
+def archive_name(args, handle: str, id: str) -> str:
+	if args.thread == True:
+		return "archive_thread_" + handle + "_" + id + ".zip"
+	elif args.only == True:
+		return "archive_single_" + handle + "_" + id + ".zip"
+	else:
+		return "archive_" + handle + "_" + id + ".zip"
+
+### tweet_search(): search a url and save its archive
+# Returns "" if it was successful, or the url if it failed
+async def tweet_search(args, page, url: str, currenttweet: int, num_searches: int, progress_callback, meter: NetworkMeter = None, timer: Timer = None):
+	search = await browse_search(args, page, url, currenttweet, num_searches, progress_callback, meter, timer)
+	return await finish_search(search)
+
+### browse_search(): the part of tweet_search() that needs the web browser
+# Returns the search, for finish_search() to save once its videos are done compositing, so the page can move on to another url in the meantime
+# 'meter' is the page's NetworkMeter, if there is one, to log how much was loaded for the url
+# 'timer' records how long each stage of the search takes when '--timings' is used
+async def browse_search(args, page, url: str, currenttweet: int, num_searches: int, progress_callback, meter: NetworkMeter = None, timer: Timer = None) -> dict:
+	log = logging.getLogger(__name__)
+	
+	# Imported here rather than up top, so that only searches pay for loading it
+	from PIL import Image # Used for combining images in threads
+	
+	if meter is not None:
+		meter.reset()
+	
+	if timer is None:
+		timer = Timer()
+	
 	# Set up the metadata for the current scrape
 	tisInfo = {}
 	tisInfo['version'] = __version__
@@ -200,36 +277,71 @@ async def tweet_search(args, page, url: str, currenttweet: int, num_searches: in
 		del tisInfo['arguments']['cookies']
 	
 	# Get author and ID information for file naming
-	tweetAuthor = url.split('/')[3]
-	tweetID     = url.split('/')[5].split('?')[0]
+	(tweetAuthor, tweetID) = parseTweetURL(url)
 	
 	# Create object that holds data for the tweets
 	search = {}
 	search['args'] = args # We have this in the search object since it's not saved to the json at the end and we need the cookie file name
 	search['target'] = url # Move this to just a variable and not in the object?
+	search['handle'] = tweetAuthor
+	search['id'] = tweetID
 	search['num_searches'] = num_searches
 	search['current_search_num'] = currenttweet
 	search['num_tweets'] = 0
 	search['json'] = {'tis': {}, 'tweets': []}
 	search['json']["tis"] = tisInfo
 	search['image'] = Image.new("RGBA", (0,0))
+	search['timer'] = timer.for_url(url) # Every stage timed during this search is labeled with its url
+	search['store'] = open_media_store(args) # Where images and videos are kept instead of in the zip, if anywhere
+	search['media'] = None # Fetches images through the web browser instead of downloading them separately
+	search['encodes'] = [] # The videos still being composited in the background (see capture_video())
+	search['save_single'] = False # Whether the one tweet found before a dead end is saved on its own (see detect())
+	
+	if args.reuse_media:
+		search['media'] = MediaCapture(page, args.mirror)
 	
 	# Create the zip file that capture will save to
-	if args.thread == True:
-		search['zip'] = ZipFile("archive_thread_" + tweetAuthor + "_" + tweetID + ".zip", 'w')
-	elif args.only == True:
-		search['zip'] = ZipFile("archive_single_" + tweetAuthor + "_" + tweetID + ".zip", 'w')
-	else:
-		search['zip'] = ZipFile("archive_" + tweetAuthor + "_" + tweetID + ".zip", 'w')
+	search['zip'] = ZipFile(archive_name(args, tweetAuthor, tweetID), 'w')
+	
+	try:
+		# Do the thing! Returns the number of tweets captured
+		with search['timer'].span("search"):
+			search = await detect(search, page, progress_callback)
+	except BaseException:
+		# A search that raises leaves nothing behind, since a half-written archive would look like a finished one to '--skip-existing'
+		# (A video that was still downloading is thrown away by capture() itself)
+		await cancel_videos(search)
+		discard_archive(search)
+		raise
+	
+	if meter is not None:
+		log.info(meter.summary(url))
 	
-	# Do the thing! Returns the number of tweets captured
-	search = await detect(search, page, progress_callback)
+	return search
+
+### discard_archive(): close and delete the archive of a search that failed
+def discard_archive(search: dict) -> None:
+	search['zip'].close()
+	if os.path.isfile(search['zip'].filename):
+		os.remove(search['zip'].filename)
+
+### finish_search(): wait for a search's videos to finish compositing, then save its archive
+# Returns "" if it was successful, or the url if it failed
+async def finish_search(search: dict) -> str:
+	args = search['args']
+	(tweetAuthor, tweetID) = (search['handle'], search['id'])
+	
+	# The web browser is done with this search, but its videos may still be compositing
+	if search['num_tweets'] == 0:
+		await cancel_videos(search)
+	else:
+		with search['timer'].span("composite_wait"):
+			if not await finish_videos(search):
+				search['num_tweets'] = 0
 	
 	if search['num_tweets'] == 0:
 		# No tweets, so we delete the empty zip that was created
-		search['zip'].close()
-		if os.path.isfile(search['zip'].filename):
-			os.remove(search['zip'].filename)
+		discard_archive(search)
 		
 		# The search didn't capture anything, so we let the user know it failed by returning the URL
 		return search['target']
@@ -244,67 +356,258 @@ async def tweet_search(args, page, url: str, currenttweet: int, num_searches: in
 		else:
 			filename = "capture_full_" + tweetAuthor + "_" + tweetID
 		
-		# Only save the 'thread' buffer if you're just doing a single tweet or have multiple tweets in your default capture
-		# This is so we don't make duplicates - see the logic inside of capture()
-		if search['num_tweets'] > 1 or args.only == True:
-			image = BytesIO()
-			search['image'].save(image, format='PNG')
-			saveZip(search['zip'], filename + ".png", image.getvalue())
-		
-		# Only save the overall json if we're not just grabbing one tweet
-		if search['num_tweets'] > 1 and args.only == False:
-			saveZip(search['zip'], filename + ".json", json.dumps(search['json'], indent=2))
-		
-		# Close the ZipFile because that's probably smart
-		search['zip'].close()
+		with search['timer'].span("save"):
+			# Only save the 'thread' buffer if you're just doing a single tweet or have multiple tweets in your default capture
+			# This is so we don't make duplicates - see the logic inside of capture()
+			if search['num_tweets'] > 1 or args.only == True:
+				image = BytesIO()
+				search['image'].save(image, format='PNG')
+				saveZip(search['zip'], filename + ".png", image.getvalue())
+			elif search['save_single'] == True:
+				image = BytesIO()
+				search['image'].save(image, format='PNG')
+				# TODO RELEASE: do the json here too???
+				saveZip(search['zip'], "capture_" + tweetAuthor + "_" + tweetID + ".png", image.getvalue())
+			
+			# Only save the overall json if we're not just grabbing one tweet
+			if search['num_tweets'] > 1 and args.only == False:
+				saveZip(search['zip'], filename + ".json", json.dumps(search['json'], indent=2))
+			
+			# The archive needs to say which media in the store belongs in it
+			if search['store'] is not None:
+				search['store'].save_manifest(search['zip'])
+			
+			# Close the ZipFile because that's probably smart
+			search['zip'].close()
 		
 		# Return that the search was successful
 		return ""
 
-### run_playwright(): sets up playwright and calls tweet_search()
-async def run_playwright(args, urls, progress_callback: Signal):
+### launch_browser(): launch the web browser that searches run in
+async def launch_browser(p):
 	log = logging.getLogger(__name__)
+	
+	### Firefox and chrome break in different ways
+	# - on chrome, videos don't load properly to allow for differentiating GIFs from videos
+	# - on firefox, the browser context isn't able to set up properly with the options
+	
+	try:
+		browser = await p.chromium.launch()
+		#browser = await p.firefox.launch()
+	except PlaywrightError as browser_error:
+		log.error("Playwright Install Error\nPlaywright needs to install or update the web browsers it uses for TweetInStone to work\nPlease run the command `playwright install --with-deps` in order to get Playwright functional\nFor more information on what this does, visit https://playwright.dev/python/docs/browsers\n")
+		# Show the original playwright error message (b/c it's hella cute)
+		#print(browser_error.name + ": " + browser_error.message)
+		exit(1)
+	
+	return browser
 
-	failedsearch = [] # Track what searches failed for output at the end of a large amount of searches
+### launch_capture(): launch the web browser, or a persistent profile of it when '--profile-dir' is used
+# Returns (browser, context): with a persistent profile every page shares the profile's one context and there is no separate browser
+async def launch_capture(p, args, cookies: list) -> tuple:
+	log = logging.getLogger(__name__)
 	
-	progress_callback.emit((0, 0, "", 1, None))
+	if args.profile_dir is None:
+		return (await launch_browser(p), None)
+	
+	# A persistent profile keeps x.com's scripts, fonts and emoji in chromium's disk cache between runs
+	# Chromium evicts the least recently used parts of the cache itself to stay under the size cap
+	log.debug("Using browser profile '" + args.profile_dir + "' with a " + str(args.cache_size) + " MB cache")
+	try:
+		context = await p.chromium.launch_persistent_context(args.profile_dir, args=['--disk-cache-size=' + str(args.cache_size * 1048576)], **context_options(args))
+	except PlaywrightError as browser_error:
+		log.error("Unable to launch the web browser with the profile '" + args.profile_dir + "' (Is it already in use by another search?)")
+		log.error(browser_error.message)
+		exit(1)
+	
+	if len(cookies) > 0:
+		log.warning("The browser profile '" + args.profile_dir + "' will keep a copy of your session cookie. Keep it as safe as the cookie file itself!")
+		await context.add_cookies(cookies)
+	
+	return (None, context)
 
-	# Set up the web browser using playwright
-	async with async_playwright() as p:
-		### Firefox and chrome break in different ways
-		# - on chrome, videos don't load properly to allow for differentiating GIFs from videos
-		# - on firefox, the browser context isn't able to set up properly with the options
+### context_options(): the browser context settings every search uses
+def context_options(args) -> dict:
+	# Viewport is a (vertical) 4K resolution
+	# With the default 4x DPI scaling, tweet width is 2396px
+	# TODO POLISH: perhaps set a user agent to be polite about it?
+	return {
+		'viewport': { 'width': 2160, 'height': 3840 },
+		'device_scale_factor': args.scale,
+		'color_scheme': args.color,
+		'locale': args.locale,
+		'timezone_id': args.timezone,
+	}
+
+### new_capture_context(): create a browser context with the settings every search uses
+# Each concurrent job gets its own context so that cookies, history and navigation stay separate
+async def new_capture_context(browser, args, cookies: list):
+	### Create browser context with proper settings ###
+	context = await browser.new_context(**context_options(args))
+	
+	# Import user session cookie into browser session
+	if len(cookies) > 0:
+		# Reference: https://playwright.dev/python/docs/api/class-browsercontext#browser-context-add-cookies
+		await context.add_cookies(cookies)
+	
+	return context
+
+### new_capture_page(): open a page with the network profile applied and a meter attached
+async def new_capture_page(context, args) -> tuple:
+	page = await context.new_page()
+	
+	meter = NetworkMeter()
+	await meter.attach(page)
+	
+	if args.mirror is not None:
+		await apply_mirror(page, args.mirror)
+	
+	# Routing requests turns off the browser's HTTP cache, which would defeat the point of a persistent profile
+	await apply_profile(page, args.network_profile, meter, cached=(args.profile_dir is not None))
+	
+	# Load x.com once so its scripts are cached and its connections are open before the first real search
+	if args.warmup:
+		log = logging.getLogger(__name__)
+		try:
+			await page.goto("https://x.com/", wait_until="load")
+			log.debug("Warmed up the browser (" + str(round(meter.bytes / 1048576, 2)) + " MB transferred)")
+		except PlaywrightError:
+			log.warning("Warm up navigation failed, continuing anyway")
+	
+	return (page, meter)
+
+### search_worker(): pull urls off the work queue and search them one at a time with its own page
+# Several of these run at once when '--jobs' is above 1
+# 'run' holds what every worker in the run shares: the arguments, cookies, work queue, failed searches and journal
+async def search_worker(run: dict, progress_callback):
+	log = logging.getLogger(__name__)
+	args = run['args']
+	
+	# Pages share the one context of a persistent profile, otherwise each worker gets its own
+	if run['context'] is not None:
+		context = run['context']
+	else:
+		context = await new_capture_context(run['browser'], args, run['cookies'])
+	
+	# Create the page we'll be passing to all future functions
+	(page, meter) = await new_capture_page(context, args)
+	
+	while True:
+		job = await run['queue'].get()
+		
+		# 'None' is the signal that there are no more urls to search
+		if job is None:
+			run['queue'].task_done()
+			break
+		
+		currenttweet = job[0]
+		url = job[1]
+		
+		if run['journal'] is not None:
+			run['journal'].mark(canonicalURL(url), "running")
 		
+		# Run the tweet search for that url
+		progress_callback.emit((currenttweet, 0, "", 3, None))
+		# One broken search shouldn't take every other job down with it, so anything it raises only fails that search
 		try:
-			browser = await p.chromium.launch()
-			#browser = await p.firefox.launch()
-		except PlaywrightError as browser_error:
-			log.error("Playwright Install Error\nPlaywright needs to install or update the web browsers it uses for TweetInStone to work\nPlease run the command `playwright install --with-deps` in order to get Playwright functional\nFor more information on what this does, visit https://playwright.dev/python/docs/browsers\n")
-			# Show the original playwright error message (b/c it's hella cute)
-			#print(browser_error.name + ": " + browser_error.message)
-			exit(1)
+			search = await browse_search(args, page, url, currenttweet, run['num_searches'], progress_callback, meter, run['timer'])
+		except Exception:
+			log.exception("Search of '" + url + "' raised an error")
+			search = None
+			
+			# The rest of this job's searches need a page to run in
+			if page.is_closed():
+				(page, meter) = await new_capture_page(context, args)
+		finally:
+			run['queue'].task_done()
 		
-		### Create browser context with proper settings ###
-		# Viewport is a (vertical) 4K resolution
-		# With the default 4x DPI scaling, tweet width is 2396px
-		# TODO POLISH: perhaps set a user agent to be polite about it?
-		context = await browser.new_context(
-			viewport={ 'width': 2160, 'height': 3840 },
-			device_scale_factor=args.scale,
-			color_scheme=args.color,
-			locale=args.locale,
-			timezone_id=args.timezone,
-		)
+		# The page is done with this url, so it moves on to the next one while this one's videos finish compositing and its archive is saved
+		finishing = asyncio.ensure_future(finish_job(run, url, search))
+		run['finishing'].add(finishing)
+		finishing.add_done_callback(run['finishing'].discard)
 		
-		# Import user session cookie into browser session
-		if args.cookies:
-			cookies = parse_cookies(args)
+		# Each search that's waiting on its videos holds its archive open and its image in memory, so only so many are let to pile up
+		while len(run['finishing']) > 2 * max(1, args.encode_jobs):
+			await asyncio.wait(run['finishing'], return_when=asyncio.FIRST_COMPLETED)
+	
+	# Clean up
+	await page.close()
+	if run['context'] is None:
+		await context.close()
+
+### finish_job(): finish a search that search_worker() has moved on from, and record how it went
+# 'search' is None if the search already failed in the web browser
+async def finish_job(run: dict, url: str, search: dict) -> None:
+	log = logging.getLogger(__name__)
+	
+	if search is None:
+		search_result = url
+	else:
+		try:
+			search_result = await finish_search(search)
+		except Exception:
+			log.exception("Saving the search of '" + url + "' raised an error")
+			search_result = url
 			
-			# Reference: https://playwright.dev/python/docs/api/class-browsercontext#browser-context-add-cookies
-			await context.add_cookies(cookies)
+			await cancel_videos(search)
+			discard_archive(search)
+	
+	# Each search reports its own failure, so the failed list stays correct regardless of the order jobs finish in
+	if search_result != "":
+		run['failed'].append(search_result)
 		
-		# Create the page we'll be passing to all future functions
-		page = await context.new_page()
+		if run['journal'] is not None:
+			run['journal'].mark(canonicalURL(url), "failed")
+	elif run['journal'] is not None:
+		(handle, tweetid) = parseTweetURL(url)
+		run['journal'].mark(canonicalURL(url), "done", archive_name(run['args'], handle, tweetid))
+	
+	# Without a total, the best progress report is how many have been done so far
+	run['processed'] += 1
+	if run['num_searches'] == 0:
+		log.info("Processed " + str(run['processed']) + " searches so far (" + str(len(run['failed'])) + " failed)")
+
+### run_playwright(): sets up playwright and calls tweet_search()
+async def run_playwright(args, urls, progress_callback: Progress):
+	start_timings(args)
+	
+	failedsearch = await run_searches(args, urls, progress_callback)
+	
+	print_timings(args)
+	
+	return report_failures(failedsearch)
+
+### run_searches(): launch a browser and search every url, returning the list of failed searches
+# Split out of run_playwright() so each 'tis batch' worker process can run its own shard and hand the failures back to the parent
+async def run_searches(args, urls, progress_callback: Progress) -> list:
+	log = logging.getLogger(__name__)
+	
+	run = {}
+	run['args'] = args
+	run['failed'] = [] # Track what searches failed for output at the end of a large amount of searches
+	run['processed'] = 0 # Number of searches done so far, for progress when the total isn't known
+	run['finishing'] = set() # Searches the web browser is done with that are still waiting on their videos (see finish_job())
+	run['journal'] = open_journal(args) # Track the state of each search in case the run dies partway through
+	run['timer'] = Timer(args.timings) # Record how long each stage takes, if asked to
+	
+	# Searches the journal says are already done get skipped when resuming
+	if args.resume and run['journal'] is not None:
+		completed = run['journal'].completed()
+		log.info("Resuming from '" + args.journal + "' (" + str(len(completed)) + " searches already complete)")
+	else:
+		completed = set()
+	
+	progress_callback.emit((0, 0, "", 1, None))
+
+	# Set up the web browser using playwright
+	async with async_playwright() as p:
+		# Read the cookie file once, since every job's context needs the same cookies
+		if args.cookies:
+			run['cookies'] = parse_cookies(args)
+		else:
+			run['cookies'] = []
+		
+		(run['browser'], run['context']) = await launch_capture(p, args, run['cookies'])
 		
 		# Mention the search mode for feedback to the user on what's being grabbed
 		if args.thread == True:
@@ -322,50 +625,104 @@ async def run_playwright(args, urls, progress_callback: Signal):
 				print("Search mode: single tweet (due to no cookies)")
 				log.warning("Reply capture is unavailable without using the --cookie option to view as a logged in user")
 		
-		currenttweet=0
+		# Streamed urls don't have a total until they've all been read, so that's left as 0 (unknown)
+		if isinstance(urls, list):
+			run['num_searches'] = len(urls)
+			
+			# Never run more jobs than there are urls to search
+			num_jobs = max(1, min(args.jobs, run['num_searches']))
+		else:
+			run['num_searches'] = 0
+			num_jobs = max(1, args.jobs)
+		if num_jobs > 1:
+			log.debug("Running " + str(num_jobs) + " searches at a time")
 		
-		num_searches = len(urls)
+		# The queue is bounded so that the list of urls is handed out as jobs free up rather than all at once
+		run['queue'] = asyncio.Queue(maxsize=num_jobs * 2)
 		
 		### Regardless of which method of getting urls, run the same process to detect and capture them
-		for url in urls:
-			currenttweet+=1
+		async def queue_searches():
+			currenttweet=0
 			
-			# Ignore comments and empty lines
-			url = commentFilter(url)
-			if url == "":
-				continue
+			async for url in iterate_urls(urls):
+				currenttweet+=1
+				
+				# Ignore comments and empty lines
+				url = commentFilter(url)
+				if url == "":
+					continue
+				
+				# Ensure that the URL is valid or not
+				if not validURL(url):
+					run['failed'].append(url)
+					
+					if run['journal'] is not None:
+						run['journal'].mark(url, "failed")
+					continue
+				
+				# The journal is keyed by the canonical url, so the same tweet linked differently still counts as captured
+				if canonicalURL(url) in completed:
+					log.debug("Skipping '" + url + "' since the journal has it as already captured")
+					continue
+				
+				if run['journal'] is not None:
+					run['journal'].mark(canonicalURL(url), "pending")
+				
+				await run['queue'].put((currenttweet, url))
 			
-			# Ensure that the URL is valid or not
-			if not validURL(url):
-				failedsearch.append(url)
-				continue
+			# Tell each worker that there's nothing left to do
+			for job in range(num_jobs):
+				await run['queue'].put(None)
 		
-			# Run the tweet search for that url
-			progress_callback.emit((currenttweet, 0, "", 3, None))
-			search_result = await tweet_search(args, page, url, currenttweet, num_searches, progress_callback)
-			if search_result != "":
-				failedsearch.append(search_result)
+		tasks = [asyncio.ensure_future(queue_searches())]
+		for job in range(num_jobs):
+			tasks.append(asyncio.ensure_future(search_worker(run, progress_callback)))
 		
-		# Clean up
-		await page.close()
-		await context.close()
-		await browser.close()
-		
-		# Save information on failed searches
-		# Useful to track failures when doing large searches
-		if len(failedsearch) > 0:
-			log.warning("The following searches failed:")
-			for search in failedsearch:
-				log.warning(" - " + search)
+		try:
+			await asyncio.gather(*tasks)
 			
-			# Save this info to a file for future use
-			capturetime = datetime.now().strftime("%Y-%m-%d_%H%M-%S")
-			failedfile = "failed_capture_" + capturetime + ".txt"
-			saveTxt(failedfile, '\n'.join(failedsearch))
+			# The last searches may still be waiting on their videos
+			await asyncio.gather(*list(run['finishing']))
+		finally:
+			# If any job died, don't leave the others hanging on the queue
+			pending = tasks + list(run['finishing'])
+			for task in pending:
+				task.cancel()
 			
-			log.warning("List of failed searches saved at '" + failedfile + "'")
+			# Let them unwind before the journal and timer they write to are closed
+			await asyncio.gather(*pending, return_exceptions=True)
 			
-			# Return these for the GUI to log them
-			return (failedsearch, failedfile)
-		else: # No failed searches, return empty list
-			return []
\ No newline at end of file
+			if run['journal'] is not None:
+				run['journal'].close()
+			
+			run['timer'].close()
+		
+		# Clean up
+		if run['browser'] is not None:
+			await run['browser'].close()
+		else:
+			await run['context'].close()
+	
+	return run['failed']
+
+### report_failures(): log the failed searches and save them to a file
+# Useful to track failures when doing large searches
+def report_failures(failedsearch: list):
+	log = logging.getLogger(__name__)
+	
+	if len(failedsearch) > 0:
+		log.warning("The following searches failed:")
+		for search in failedsearch:
+			log.warning(" - " + search)
+		
+		# Save this info to a file for future use
+		capturetime = datetime.now().strftime("%Y-%m-%d_%H%M-%S")
+		failedfile = "failed_capture_" + capturetime + ".txt"
+		saveTxt(failedfile, '\n'.join(failedsearch))
+		
+		log.warning("List of failed searches saved at '" + failedfile + "'")
+		
+		# Return these for the GUI to log them
+		return (failedsearch, failedfile)
+	else: # No failed searches, return empty list
+		return []
\ No newline at end of file
@@ -0,0 +1,288 @@
+### serve.py
+# Functions for 'tis serve', a long-running local service that keeps its web browser warm between searches
+# Other tools submit urls over HTTP (on a port or a unix socket) and poll for when their archive is ready
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+
+from copy import copy
+from datetime import datetime
+from playwright.async_api import async_playwright
+
+## Import TIS-specific functions
+from tweetinstone.search import launch_capture, new_capture_context, new_capture_page, parse_cookies, browse_search, finish_search, discard_archive, archive_name
+from tweetinstone.text_ops import validURL, commentFilter, parseTweetURL
+from tweetinstone.timing import Timer
+from tweetinstone.progress import Progress
+from tweetinstone.capture import cancel_videos
+
+# HTTP reason phrases for the few status codes the service sends
+reasons = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+### new_job(): create the record for a submitted search
+# Returns the record (what gets sent back when polling the job's status) and the arguments the job runs with
+def new_job(args, url: str, mode: str) -> tuple:
+	# Each job gets its own copy of the arguments so the search mode can differ between jobs
+	jobargs = copy(args)
+	if mode == "only":
+		jobargs.only = True
+		jobargs.thread = False
+	elif mode == "thread":
+		jobargs.only = False
+		jobargs.thread = True
+	else:
+		jobargs.only = False
+		jobargs.thread = False
+
+	# Get author and ID information for the archive's name
+	(handle, tweetid) = parseTweetURL(url)
+
+	job = {}
+	job['id'] = uuid.uuid4().hex
+	job['url'] = url
+	job['mode'] = mode
+	job['status'] = "queued"
+	job['archive'] = os.path.abspath(archive_name(jobargs, handle, tweetid))
+	job['submitted'] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+	job['finished'] = None
+
+	return (job, jobargs)
+
+### pending_job(): the job that's queued or running to make this archive, if there is one
+def pending_job(jobs: dict, archive: str):
+	for job in jobs.values():
+		if job['status'] in ("queued", "running") and job['archive'] == archive:
+			return job
+	return None
+
+### prune_jobs(): forget the oldest finished jobs beyond the most that are kept ('--keep-jobs')
+# Otherwise a service that runs for weeks keeps the record of every job it has ever done
+# Jobs are kept in the order they were submitted, so the oldest come first. Queued and running jobs are never forgotten
+def prune_jobs(jobs: dict, limit: int) -> None:
+	finished = [jobid for (jobid, job) in jobs.items() if job['finished'] is not None]
+	for jobid in finished[:max(0, len(finished) - limit)]:
+		del jobs[jobid]
+
+### serve_worker(): keep a warm browser context and page, and search each job that comes off of the queue
+async def serve_worker(args, browser, context, cookies: list, jobs: dict, queue: asyncio.Queue, timer: Timer, progress_callback):
+	log = logging.getLogger(__name__)
+
+	# Pages share the one context of a persistent profile, otherwise each worker gets its own
+	if context is None:
+		context = await new_capture_context(browser, args, cookies)
+	(page, meter) = await new_capture_page(context, args)
+
+	# Jobs the page is done with that are still waiting on their videos (see finish_job())
+	finishing = set()
+
+	try:
+		while True:
+			(job, jobargs) = await queue.get()
+
+			job['status'] = "running"
+			log.debug("Running job " + job['id'] + " for '" + job['url'] + "'")
+
+			# This is the same search the command line runs, so the output is the same too
+			# One broken search shouldn't take the whole service down with it
+			try:
+				search = await browse_search(jobargs, page, job['url'], 1, 1, progress_callback, meter, timer)
+			except Exception as error:
+				log.exception("Job " + job['id'] + " raised an error")
+				job['error'] = type(error).__name__ + ": " + str(error)
+				search = None
+
+				# The jobs after this one need a page to run in
+				if page.is_closed():
+					(page, meter) = await new_capture_page(context, args)
+
+			# The page moves on to the next job while this one's videos finish compositing and its archive is saved
+			task = asyncio.ensure_future(finish_job(args, jobs, job, search))
+			finishing.add(task)
+			task.add_done_callback(finishing.discard)
+			queue.task_done()
+
+			# Each job that's waiting on its videos holds its archive open and its image in memory, so only so many are let to pile up
+			while len(finishing) > 2 * max(1, args.encode_jobs):
+				await asyncio.wait(finishing, return_when=asyncio.FIRST_COMPLETED)
+	finally:
+		# Jobs still waiting on their videos when the service stops go down with their worker
+		pending = list(finishing)
+		for task in pending:
+			task.cancel()
+		await asyncio.gather(*pending, return_exceptions=True)
+
+### finish_job(): finish a job that serve_worker() has moved on from, and record how it went
+# 'search' is None if the job already failed in the web browser
+async def finish_job(args, jobs: dict, job: dict, search: dict) -> None:
+	log = logging.getLogger(__name__)
+
+	if search is None:
+		search_result = job['url']
+	else:
+		try:
+			search_result = await finish_search(search)
+		except Exception as error:
+			log.exception("Job " + job['id'] + " raised an error")
+			job['error'] = type(error).__name__ + ": " + str(error)
+			search_result = job['url']
+
+			await cancel_videos(search)
+			discard_archive(search)
+
+	if search_result == "":
+		job['status'] = "done"
+	else:
+		job['status'] = "failed"
+		job['archive'] = None
+	job['finished'] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+	log.info("Job " + job['id'] + " " + job['status'] + ": '" + job['url'] + "'")
+	prune_jobs(jobs, args.keep_jobs)
+
+### send_response(): write a JSON response and close the connection
+async def send_response(writer: asyncio.StreamWriter, status: int, data) -> None:
+	body = json.dumps(data, indent=2).encode('utf-8')
+
+	header  = "HTTP/1.1 " + str(status) + " " + reasons[status] + "\r\n"
+	header += "Content-Type: application/json\r\n"
+	header += "Content-Length: " + str(len(body)) + "\r\n"
+	header += "Connection: close\r\n\r\n"
+
+	writer.write(header.encode('utf-8') + body)
+	await writer.drain()
+	writer.close()
+
+### handle_request(): handle a single HTTP request to the service
+# POST /jobs         submit {"url": "...", "mode": "default" | "only" | "thread"}
+# GET  /jobs         list every job
+# GET  /jobs/[id]    get the status and archive path of a job
+async def handle_request(args, jobs: dict, queue: asyncio.Queue, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+	log = logging.getLogger(__name__)
+
+	try:
+		requestline = (await reader.readline()).decode('utf-8').split()
+		if len(requestline) < 2:
+			await send_response(writer, 400, {'error': "Malformed request"})
+			return
+
+		method = requestline[0]
+		path   = requestline[1].split('?')[0].rstrip('/')
+
+		# Read the headers, since we only need the length of the body
+		length = 0
+		while True:
+			line = (await reader.readline()).decode('utf-8')
+			if line in ("\r\n", "\n", ""):
+				break
+			if line.lower().startswith("content-length:"):
+				length = int(line.split(':')[1])
+
+		body = b""
+		if length > 0:
+			body = await reader.readexactly(length)
+	except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError):
+		await send_response(writer, 400, {'error': "Malformed request"})
+		return
+
+	log.debug(method + " " + path)
+
+	if path == "/jobs" and method == "POST":
+		try:
+			request = json.loads(body)
+			url = commentFilter(request['url'])
+			mode = request.get('mode', "default")
+		except (ValueError, KeyError, TypeError, AttributeError):
+			await send_response(writer, 400, {'error': "Expected a JSON body with a 'url'"})
+			return
+
+		if mode not in ("default", "only", "thread"):
+			await send_response(writer, 400, {'error': "Unknown mode '" + str(mode) + "'"})
+			return
+
+		if not validURL(url):
+			await send_response(writer, 400, {'error': "Not a valid tweet url: '" + url + "'"})
+			return
+
+		(job, jobargs) = new_job(args, url, mode)
+
+		# Two jobs writing the same archive at once would ruin it, so asking again for one that's already on its way gets that job instead
+		existing = pending_job(jobs, job['archive'])
+		if existing is not None:
+			log.debug("Job " + existing['id'] + " is already making '" + job['archive'] + "'")
+			await send_response(writer, 202, existing)
+			return
+
+		jobs[job['id']] = job
+		await queue.put((job, jobargs))
+
+		await send_response(writer, 202, job)
+	elif path == "/jobs" and method == "GET":
+		await send_response(writer, 200, list(jobs.values()))
+	elif path.startswith("/jobs/"):
+		if method != "GET":
+			await send_response(writer, 405, {'error': "Use GET to poll a job"})
+			return
+
+		jobid = path.split('/')[2]
+		if jobid in jobs:
+			await send_response(writer, 200, jobs[jobid])
+		else:
+			await send_response(writer, 404, {'error': "No job with id '" + jobid + "'"})
+	else:
+		await send_response(writer, 404, {'error': "Unknown path '" + path + "'"})
+
+### run_server(): launch the browser and serve search requests until interrupted
+async def run_server(args):
+	log = logging.getLogger(__name__)
+
+	jobs = {}
+	queue = asyncio.Queue()
+
+	# The service has no end of a run to print a summary at, so its timings are only written to the file
+	timer = Timer(args.timings)
+
+	async with async_playwright() as p:
+		# Read the cookie file once, since every context needs the same cookies
+		if args.cookies:
+			cookies = parse_cookies(args)
+		else:
+			cookies = []
+
+		(browser, context) = await launch_capture(p, args, cookies)
+
+		# One warm context and page per job that can run at once
+		workers = []
+		for job in range(max(1, args.jobs)):
+			workers.append(asyncio.ensure_future(serve_worker(args, browser, context, cookies, jobs, queue, timer, Progress())))
+
+		async def handler(reader, writer):
+			await handle_request(args, jobs, queue, reader, writer)
+
+		if args.socket:
+			server = await asyncio.start_unix_server(handler, path=args.socket)
+			print("Serving on unix socket '" + args.socket + "'")
+		else:
+			server = await asyncio.start_server(handler, host=args.host, port=args.port)
+			print("Serving on http://" + args.host + ":" + str(args.port))
+
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			for worker in workers:
+				worker.cancel()
+
+			# Let them unwind before the timer they write to is closed
+			await asyncio.gather(*workers, return_exceptions=True)
+			timer.close()
+
+			if browser is not None:
+				await browser.close()
+			else:
+				await context.close()
+
+			if args.socket and os.path.exists(args.socket):
+				os.remove(args.socket)
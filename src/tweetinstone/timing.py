@@ -0,0 +1,112 @@
+### timing.py
+# Functions for timing each stage of a search, to see where the time actually goes
+# Each finished stage is written as one line of JSON, so a run that dies partway through still leaves its timings behind
+
+import json
+import time
+import logging
+
+from datetime import datetime
+
+### Timer: writes a timing span for each stage of a search to a JSONL file
+# A Timer without a file does nothing, so that code can always time its stages whether or not '--timings' is used
+class Timer:
+	def __init__(self, filename: str = None, url: str = None, file=None):
+		self.filename = filename
+		self.url = url
+		self.file = file
+
+		# Line buffered, so that each span is written out as soon as it's done
+		if self.file is None and self.filename is not None:
+			self.file = open(self.filename, 'a', buffering=1)
+
+	### for_url(): a Timer that labels its spans with the url being searched
+	def for_url(self, url: str):
+		return Timer(self.filename, url, self.file)
+
+	### span(): time a stage with a 'with' block
+	# 'tweet' is the ID of the tweet being captured, for stages that happen once per tweet
+	def span(self, stage: str, tweet: str = None):
+		return Span(self, stage, tweet)
+
+	### start(): start timing a stage that is awkward to wrap in a 'with' block, to be ended with stop()
+	def start(self, stage: str, tweet: str = None):
+		return self.span(stage, tweet).__enter__()
+
+	### record(): write a finished span
+	def record(self, stage: str, tweet: str, started: datetime, seconds: float, ok: bool) -> None:
+		if self.file is None:
+			return
+
+		span = {
+			'url': self.url,
+			'tweet': tweet,
+			'stage': stage,
+			'start': started.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+			'seconds': round(seconds, 4),
+			'ok': ok,
+		}
+		self.file.write(json.dumps(span) + "\n")
+
+	def close(self) -> None:
+		if self.file is not None:
+			self.file.close()
+
+### Span: one timed stage
+# This is a normal (not async) context manager, so it times whatever is awaited inside of it just the same
+class Span:
+	def __init__(self, timer: Timer, stage: str, tweet: str):
+		self.timer = timer
+		self.stage = stage
+		self.tweet = tweet
+
+	def __enter__(self):
+		self.started = datetime.utcnow()
+		self.start = time.monotonic()
+		return self
+
+	def __exit__(self, exctype, value, traceback):
+		# Stages that raised are still recorded, just marked as not ok
+		self.timer.record(self.stage, self.tweet, self.started, time.monotonic() - self.start, exctype is None)
+		return False
+
+	def stop(self) -> None:
+		self.__exit__(None, None, None)
+
+### start_timings(): empty the timings file at the start of a run
+# Searches (including 'tis batch' worker processes) append to it, so it has to start out empty for the summary to only cover this run
+def start_timings(args) -> None:
+	if args.timings is not None:
+		open(args.timings, 'w').close()
+
+### percentile(): the value at a percentile of a sorted list, by nearest rank
+def percentile(values: list, percent: float) -> float:
+	rank = max(1, round(percent / 100 * len(values)))
+	return values[min(rank, len(values)) - 1]
+
+### print_timings(): print the p50/p95/max of each stage in the timings file
+def print_timings(args) -> None:
+	if args.timings is None:
+		return
+
+	log = logging.getLogger(__name__)
+
+	# Stage name -> list of durations, in the order the stages first happened
+	stages = {}
+	with open(args.timings) as file:
+		for line in file:
+			try:
+				span = json.loads(line)
+			except ValueError:
+				log.warning("Skipping malformed line in '" + args.timings + "'")
+				continue
+			stages.setdefault(span['stage'], []).append(span['seconds'])
+
+	if len(stages) == 0:
+		return
+
+	print("Stage timings (seconds), saved to '" + args.timings + "':")
+	print("  " + "stage".ljust(20) + "count".rjust(8) + "p50".rjust(10) + "p95".rjust(10) + "max".rjust(10))
+	for stage in stages:
+		values = sorted(stages[stage])
+		print("  " + stage.ljust(20) + str(len(values)).rjust(8) + ("%.3f" % percentile(values, 50)).rjust(10) + ("%.3f" % percentile(values, 95)).rjust(10) + ("%.3f" % values[-1]).rjust(10))
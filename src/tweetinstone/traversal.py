@@ -1,16 +1,14 @@
 ### Traversal.py ###
 # Functions for traversing tweets in a page using Playwright
 
+import time
 import logging
-from copy import copy # Used for managing the json of arguments in a sane way
-from playwright.async_api import Page, Locator, expect, TimeoutError as PlaywrightTimeoutError
-from io import BytesIO
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
 
 ## Import TIS-specific functions
 from tweetinstone.capture import capture, deleted_capture, killshot
-from tweetinstone.text_ops import validURL
+from tweetinstone.text_ops import validURL, parseTweetURL
 from tweetinstone.media_ops import concatenate
-from tweetinstone.file_ops import saveZip
 
 # TODO RELEASE CRIT: when at end of the original list, instead of cutting off, stay on that tweet, and restart loop with the new list of tweets, ignoring already captured
 ### detect(): decide what parts of the page to capture()
@@ -27,14 +25,20 @@ async def detect(search: dict, page: Page, progress_callback):
 		search['num_tweets'] = 0
 		return search
 	
-	print("Search #" + str(search['current_search_num']) + " of " + str(search['num_searches']) + ": '" + search['target'] + "'")
+	# The total number of searches isn't known when urls are being streamed in
+	if search['num_searches'] > 0:
+		print("Search #" + str(search['current_search_num']) + " of " + str(search['num_searches']) + ": '" + search['target'] + "'")
+	else:
+		print("Search #" + str(search['current_search_num']) + ": '" + search['target'] + "'")
 	
 	# TODO Optimization: clean up this given fullwait() does most of it later
 	# Catch potential page loading error
 	retrylimit = 3
 	for retries in range(retrylimit):
 		try:
-			await page.goto(search['target'], wait_until="load");
+			with search['timer'].span("goto"):
+				# Only wait for the document itself; fullwait() watches for the tweet from there, without also waiting on every image to load
+				await page.goto(search['target'], wait_until="domcontentloaded");
 			
 			# No need to retry loading if there was no problem
 			break
@@ -69,11 +73,11 @@ async def detect(search: dict, page: Page, progress_callback):
 		# GRAB THE "Learn more" within an <a>
 		
 		#tweets = await page.get_by_test_id("tweet").all()
-		tweets = await page.get_by_role("article").all()
-		originaltweets = copy(tweets)
+		# Everything detect() needs to know about each article is read in one go, instead of asking the browser about each article (and each link in it) separately
+		inventory = await article_inventory(search, page)
 		
 		# Exit early if no tweets
-		if len(tweets) == 0:
+		if len(inventory) == 0:
 			log.warning("No tweets found - the tweet '" + search['target'] + "' may be private/age-restricted/deleted")
 			search['num_tweets'] = 0
 			return search
@@ -98,24 +102,30 @@ async def detect(search: dict, page: Page, progress_callback):
 		search['num_tweets'] = 0
 		return search
 	
+	# Threads can run far past what's on the page at first, so they're read by scrolling through the conversation instead
+	if search['args'].thread == True:
+		return await detect_thread(search, page, progress_callback)
+	
+	# Everything above the searched tweet in its conversation is the chain of tweets it's replying to
+	# The conversation is virtualized, so the ones furthest up might not be on the page (or in the inventory) yet. The whole chain is read by scrolling down from the top of it
+	if search['args'].only == True:
+		articles = iterate_inventory(inventory)
+	else:
+		articles = scroll_articles(search, page)
+	
 	search['current_tweet_iterator'] = 0
 	previous_tweet_valid = True
-	for tweet in originaltweets:
-		try: 
-			# Grab the link to the current tweet from the tweet itself
-			tweetUrl = await tweet.get_by_role("link").last.get_attribute('href')
-		except PlaywrightTimeoutError:
-			log.error("Timeout occured when finding elements of tweet '" + search['target'] + "'")
-			search['num_tweets'] = 0
-			return search
+	async for article in articles:
+		# The locator for this article, for when it needs to be clicked on or captured
+		tweet = page.get_by_role("article").nth(article['index'])
 		
 		# Make sure the tweet is real
-		if tweetUrl is not None:
+		if article['id'] is not None or article['deleted']:
 			search['current_tweet_iterator'] += 1
 			 
 			# Make sure this isn't just a placeholder for banned/suspended tweet
-			if tweetUrl == "https://help.twitter.com/rules-and-policies/notices-on-twitter":
-				tweetreason = await tweet.inner_text()
+			if article['deleted']:
+				tweetreason = article['text']
 				
 				# Use special function to capture the not-tweet for threads
 				# TODO REVIEW: is this using the right url?
@@ -126,19 +136,25 @@ async def detect(search: dict, page: Page, progress_callback):
 				previous_tweet_valid = False
 				continue
 		
-			log.debug("Checking tweet #" + str(search['current_tweet_iterator']) + ': "' + tweetUrl +'"')
+			log.debug("Checking tweet #" + str(search['current_tweet_iterator']) + ': "' + article['href'] +'"')
 		
 			# Assign the user handle and tweet ID to variables for readability
-			handle  = tweetUrl.split("/")[1]
-			tweetid = tweetUrl.split('/')[3]
+			handle  = article['handle']
+			tweetid = article['id']
 			
 			# 'page.url' is the url that the page is currently on
 			# whereas 'search['target'].' is the original search url
-			if tweetid == search['target'].split('/')[5].split("?")[0]:
+			if tweetid == search['id']:
 				# The tweet being observed is the tweet originally specified
+				tweet = await find_tweet(search, page, handle, tweetid)
+				if tweet is None:
+					log.error("The tweet '" + search['target'] + "' scrolled out of the page before it could be captured")
+					search['num_tweets'] = 0
+					return search
 				
 				# Capture the tweet
-				captured = await capture(search, tweet, handle, tweetid, progress_callback)
+				with search['timer'].span("capture", tweetid):
+					captured = await capture(search, tweet, handle, tweetid, progress_callback)
 				if not captured['successful']:
 					search['num_tweets'] = 0
 					return search
@@ -148,125 +164,14 @@ async def detect(search: dict, page: Page, progress_callback):
 				progress_callback.emit((0, 0, "", 0, search['image']))
 				search['json']['tweets'].append(captured['json'])
 				
-				if search['args'].thread != True:
-					# Since we're not grabbing the thread, break from loop as soon as we've found it
-					if search['args'].only == True:
-						log.debug("Ending detection (SINGLE mode) and returning [1] tweets")
-					else:
-						log.debug("Ending detection (DEFAULT mode) and returning [" + str(search['current_tweet_iterator']) + "] tweets")
-					search['num_tweets'] = search['current_tweet_iterator']
-					return search
-			elif search['args'].thread == True:
-				# We're grabbing the whole thread
-				
-				if handle == search['target'].split('/')[3]:
-					# The current tweet is from the original tweet author, so grab it
-					### TODO RELEASE THIS IS THE PROBLEMATIC PART
-					# TODO RELEASE TEST
-					oldid = deepcopy(tweetid)
-					# Click on the next tweet, being careful to not accidentally click on an image
-					await tweet.click(position={'x': 1,'y': 1})
-					try:
-						await page.wait_for_url('https://x.com/' + handle + '/status/' + tweetid, wait_until="load")
-					except PlaywrightTimeoutError:
-						log.error("Timeout occured when finding elements of tweet '" + search['target'] + "'")
-						search['num_tweets'] = 0
-						return search
-					
-					loaded = await fullwait(search, page, progress_callback)
-					if not loaded:
-						search['num_tweets'] = 0
-						return search
-					# Paranoia
-					await page.wait_for_load_state()
-					await page.wait_for_load_state('domcontentloaded')
-					#await page.wait_for_load_state('networkidle')
-					await page.reload()
-					
-					loaded = await fullwait(search, page, progress_callback)
-					if not loaded:
-						search['num_tweets'] = 0
-						return search
-					#currenttweets = await page.get_by_test_id("tweet").all()
-					# Make sure this tweet is actually in the thread - sometimes the tweet's position can change on the page
-					# Edge case is one thread that also has another reply to the original tweet from the original author
-					#for extweet in currenttweets:
-						# Grab the link to the current tweet from the tweet itself
-					#	extweetUrl = await extweet.get_by_role("link").last.get_attribute('href')
-
-						# Make sure the tweet is real
-					#	if extweetUrl is not None:
-					#		print('#: "' + extweetUrl +'"')
-					
-					#for currenttweet in currenttweets:
-						# Grab the link to the current tweet from the tweet itself
-					#	currentTweetUrl = await currenttweet.get_by_role("link").last.get_attribute('href')
-						
-						# Make sure the tweet is real
-					#	if currentTweetUrl is not None:
-					#		print(oldid + " != " + tweetid + " ?= " + currentTweetUrl)
-					#		print("page = " + page.url)
-					#		if tweetid == currentTweetUrl.split('/')[3]:
-					#			await killshot(page)
-					#			print("sending  '" + currentTweetUrl + "' to capture")
-					#			captured = await capture(currenttweet, handle, tweetid)
-					#			thread = await concatenate(thread, captured['screenshot'])
-					#			threadjson['tweets'].append(captured['json'])
-					#			break
-					
-					for currenttweet in tweets:
-						currentTweetUrl = await currenttweet.get_by_role("link").last.get_attribute('href')
-						currentTweetlinks = await currenttweet.get_by_role("link").all()
-						for link in currentTweetlinks:
-							href = await link.get_attribute('href')
-							#print("link: " + href)
-							#await killshot(currenttweet)
-						if currentTweetUrl is not None:
-							#print("TEST " + currentTweetUrl)
-							#print("tweetid = " + tweetid)
-							#await killshot(page)
-							#await killshot(currenttweet)
-							if currentTweetUrl.split('/')[3] == tweetid:
-								captured = await capture(search, currenttweet, handle, tweetid, progress_callback)
-								if not captured['successful']:
-									search['num_tweets'] = 0
-									return search
-								
-								search['image'] = concatenate(search['image'], captured['screenshot'])
-								# This will update the preview image to the latest thread concatenation
-								progress_callback.emit((0, 0, "", 0, search['image']))
-								
-								search['json']['tweets'].append(captured['json'])
-								break
-					#await killshot(page)
-					
-					# Return to previous page (the original tweet)
-					await page.go_back()
-					loaded = await fullwait(search, page, progress_callback)
-					if not loaded:
-						search['num_tweets'] = 0
-						return search
-					# Paranoia
-					await page.wait_for_load_state()
-					await page.wait_for_load_state('domcontentloaded')
-					
-					await page.reload()
-					
-					loaded = await fullwait(search, page, progress_callback)
-					if not loaded:
-						search['num_tweets'] = 0
-						return search
-					#await page.wait_for_load_state('networkidle')
+				# Since we're not grabbing the thread, break from loop as soon as we've found it
+				if search['args'].only == True:
+					log.debug("Ending detection (SINGLE mode) and returning [1] tweets")
 				else:
-					# Tweet isn't from the original author. This means we reached the end of the thread - time to die
-					log.debug("Ending detection (THREAD mode) and returning [" + str(search['current_tweet_iterator']) + "] tweets")
-					
-					# Decrement iterator to give accurate tweet count since the last one wasn't captured
-					search['current_tweet_iterator']-=1
-					
-					search['num_tweets'] = search['current_tweet_iterator']
-					return search
-			elif search['args'].only == False: 
+					log.debug("Ending detection (DEFAULT mode) and returning [" + str(search['current_tweet_iterator']) + "] tweets")
+				search['num_tweets'] = search['current_tweet_iterator']
+				return search
+			elif search['args'].only == False:
 				# We're not grabbing a whole thread
 				# And, we're not grabbing the single tweet
 				# So: grab everything until you reach the original tweet
@@ -282,44 +187,55 @@ async def detect(search: dict, page: Page, progress_callback):
 				# Tweet is occuring after a deleted/inaccessable tweet
 				# AND
 				# Tweet isn't from the original author
-				if not previous_tweet_valid and handle != search['target'].split('/')[3]:
+				if not previous_tweet_valid and handle != search['handle']:
 					log.debug("Next tweet occurs after an invalid tweet. Time to die")
 					search['current_tweet_iterator']-=1
 					
 					# If we only got one tweet, we'll save that to file
+					# Its video (if it has one) may still be compositing, so finish_search() saves it once that's done
 					if search['current_tweet_iterator'] == 1:
-						image = BytesIO()
-						search['image'].save(image, format='PNG')
-						
-						# Get filename based off of the base url
-						handle =  search['target'].split('/')[3]
-						id = search['target'].split('/')[5].split('?')[0]
-						name = handle + "_" + id
-						
-						saveZip(search['zip'], "capture_" + name + ".png", image.getvalue())
-								
-						# TODO RELEASE: do the json here too???
-						#saveZip(search['zip'], filename + ".json", json.dumps(threadjson, indent=2))
+						search['save_single'] = True
 					search['num_tweets'] = search['current_tweet_iterator']
 					return search
 				
 				log.debug("Grabbing tweet because its before the one being searched for")
 				
-				# Click on the next tweet, being careful to not accidentally click on an image
-				await tweet.click(position={'x': 1,'y': 1})
-				try:
-					await page.wait_for_url('https://x.com/' + handle + '/status/' + tweetid, wait_until="load")
-				except PlaywrightTimeoutError:
-					log.error("Timeout occured when finding elements of tweet '" + search['target'] + "'")
-					search['num_tweets'] = 0
-					return search
+				# The page for the searched tweet already shows every tweet it's replying to, so they're captured right where they are
+				# The tweet's own page is only opened when it can't be found here (or when asked to with '--ancestors navigate')
+				tweet = await find_tweet(search, page, handle, tweetid)
+				inplace = search['args'].ancestors == "page" and tweet is not None
+				
+				if not inplace:
+					if tweet is None:
+						log.debug("Tweet '" + article['href'] + "' isn't on the page anymore, so it's opened on its own")
 					
-				loaded = await fullwait(search, page, progress_callback)
-				if not loaded:
-					search['num_tweets'] = 0
-					return search
+					try:
+						with search['timer'].span("navigate", tweetid):
+							if tweet is not None:
+								# Click on the next tweet, being careful to not accidentally click on an image
+								await tweet.click(position={'x': 1,'y': 1})
+								await page.wait_for_url('https://x.com/' + handle + '/status/' + tweetid, wait_until="load")
+							else:
+								await page.goto('https://x.com/' + handle + '/status/' + tweetid, wait_until="domcontentloaded")
+					except PlaywrightTimeoutError:
+						log.error("Timeout occured when finding elements of tweet '" + search['target'] + "'")
+						search['num_tweets'] = 0
+						return search
+						
+					loaded = await fullwait(search, page, progress_callback)
+					if not loaded:
+						search['num_tweets'] = 0
+						return search
+					
+					# On its own page, it's the tweet the page is opened to
+					tweet = await find_tweet(search, page, handle, tweetid)
+					if tweet is None:
+						log.error("Couldn't find the tweet '" + article['href'] + "' on its own page")
+						search['num_tweets'] = 0
+						return search
 				
-				captured = await capture(search, tweet, handle, tweetid, progress_callback)
+				with search['timer'].span("capture", tweetid):
+					captured = await capture(search, tweet, handle, tweetid, progress_callback)
 				if not captured['successful']:
 					search['num_tweets'] = 0
 					return search
@@ -331,72 +247,362 @@ async def detect(search: dict, page: Page, progress_callback):
 				
 				search['json']['tweets'].append(captured['json'])
 				
-				# Return to previous page (the original tweet) so search remains consistent
-				await page.go_back()
-				loaded = await fullwait(search, page, progress_callback)
-				if not loaded:
-					search['num_tweets'] = 0
-					return search
+				if not inplace:
+					# Return to previous page (the original tweet) so search remains consistent
+					with search['timer'].span("go_back"):
+						await page.go_back()
+					loaded = await fullwait(search, page, progress_callback)
+					if not loaded:
+						search['num_tweets'] = 0
+						return search
+					
+					# The page comes back scrolled to the searched tweet, so scroll back up to where the chain was left off
+					await find_tweet(search, page, handle, tweetid)
+	
+	# Every tweet in the chain was checked without reaching the searched tweet
+	log.error("Couldn't find the tweet '" + search['target'] + "' in its own conversation")
+	search['num_tweets'] = 0
+	return search
+
+### iterate_inventory(): the articles from article_inventory(), in the same form as scroll_articles() gives them
+async def iterate_inventory(inventory: list):
+	for article in inventory:
+		yield article
+
+### detect_thread(): capture the whole thread that the searched tweet is part of
+# A thread is the unbroken run of tweets by the searched tweet's author that the searched tweet is in
+# The conversation is scrolled through from the top, and each of the author's tweets is captured right where it is as it comes into view,
+# so nothing is navigated to or reloaded and the time taken grows with the length of the thread
+async def detect_thread(search: dict, page: Page, progress_callback):
+	log = logging.getLogger(__name__)
+	
+	search['current_tweet_iterator'] = 0
+	
+	# The author's tweets above the searched tweet, since the last tweet by anyone else
+	# These aren't captured until the searched tweet shows up, since a tweet by someone else in between would mean they're not part of its thread
+	pending = []
+	found = False
+	
+	async for article in scroll_articles(search, page):
+		if article['deleted']:
+			# Only a placeholder inside the thread is worth capturing; one above it can't be told apart from any other
+			if found:
+				search['current_tweet_iterator'] += 1
+				captured = await deleted_capture(search, page.get_by_role("article").nth(article['index']), search['target'], article['text'])
+				search['image'] = concatenate(search['image'], captured['screenshot'])
+				# This will update the preview image to the latest thread concatenation
+				progress_callback.emit((0, 0, "", 0, search['image']))
+			continue
+		
+		log.debug("Checking tweet: \"" + article['href'] + "\"")
+		
+		if not found:
+			if article['id'] == search['id']:
+				found = True
+				for threadtweet in pending + [article]:
+					if not await capture_thread_tweet(search, page, threadtweet, progress_callback):
+						search['num_tweets'] = 0
+						return search
+			elif article['handle'] == search['handle']:
+				pending.append(article)
+			else:
+				pending = []
+		elif article['handle'] == search['handle']:
+			if not await capture_thread_tweet(search, page, article, progress_callback):
+				search['num_tweets'] = 0
+				return search
+		else:
+			# Tweet isn't from the original author. This means we reached the end of the thread
+			break
+	
+	if not found:
+		log.error("Couldn't find the tweet '" + search['target'] + "' in its own conversation")
+		search['num_tweets'] = 0
+		return search
+	
+	log.debug("Ending detection (THREAD mode) and returning [" + str(search['current_tweet_iterator']) + "] tweets")
+	search['num_tweets'] = search['current_tweet_iterator']
+	return search
+
+### capture_thread_tweet(): capture one tweet of a thread where it is on the page, returning whether it was successful
+async def capture_thread_tweet(search: dict, page: Page, article: dict, progress_callback) -> bool:
+	log = logging.getLogger(__name__)
+	
+	tweet = await find_tweet(search, page, article['handle'], article['id'])
+	if tweet is None:
+		log.warning("Tweet '" + article['href'] + "' scrolled out of the page before it could be captured, skipping it")
+		return True
+	
+	search['current_tweet_iterator'] += 1
+	with search['timer'].span("capture", article['id']):
+		captured = await capture(search, tweet, article['handle'], article['id'], progress_callback)
+	if not captured['successful']:
+		return False
+	
+	search['image'] = concatenate(search['image'], captured['screenshot'])
+	# This will update the preview image to the latest thread concatenation
+	progress_callback.emit((0, 0, "", 0, search['image']))
+	search['json']['tweets'].append(captured['json'])
+	return True
+
+### find_tweet(): the locator for a tweet on the page, found by the link to it rather than its position
+# Articles' positions shift as the conversation is scrolled, so an index from an earlier article_inventory() can't be trusted
+# The conversation only keeps the tweets near the viewport on the page, so one that's scrolled too far away is scrolled back to
+async def find_tweet(search: dict, page: Page, handle: str, id: str):
+	tweet = page.get_by_role("article").filter(has=page.locator('a[href="/' + handle + '/status/' + id + '"]')).first
+	
+	for attempt in range(scrolllimit):
+		if await tweet.count() > 0:
+			return tweet
+		
+		# Tweets that are missing have been scrolled past, so they're above the viewport
+		if not await page.evaluate(scroll_script, -0.5):
+			break
+		await settle(search, page)
+	
+	return None
+
+# How many times to scroll back looking for a tweet before giving up on it
+scrolllimit = 20
+
+### scroll_articles(): every article in the conversation once, from top to bottom, scrolling down through it as needed
+# Yields the same entries as article_inventory()
+# The conversation is a virtualized list: only the cells ('cellInnerDiv') near the viewport are on the page, and they're swapped out as it's scrolled,
+# so articles are told apart by their tweet ID rather than by their position
+async def scroll_articles(search: dict, page: Page):
+	seen = set()
+	
+	# The page opens scrolled down to the searched tweet, so the tweets above it might not be on the page
+	await page.evaluate("() => window.scrollTo(0, 0)")
+	await settle(search, page)
+	
+	while True:
+		new = 0
+		# Placeholders for deleted tweets have no ID of their own, so they're known by the tweet above them
+		previous = None
+		for article in await article_inventory(search, page):
+			if article['deleted']:
+				key = "deleted after " + str(previous)
+			elif article['id'] is not None:
+				key = article['id']
+			else:
+				continue
+			previous = key
+			
+			if key in seen:
+				continue
+			seen.add(key)
+			new += 1
+			yield article
+		
+		with search['timer'].span("scroll"):
+			moved = await page.evaluate(scroll_script, 0.8)
+			await settle(search, page)
+		
+		# At the bottom, more of the conversation may have just been loaded in; once nothing new has been, that's the end of it
+		if not moved and new == 0:
+			return
+
+### settle(): wait until the page stops changing after being scrolled
+# Scrolling swaps cells in and out and can load in more of the conversation
+async def settle(search: dict, page: Page) -> None:
+	await page.evaluate(settle_script, min(search['args'].ready_timeout, settlelimit) * 1000)
+
+# The most seconds to wait for the page to settle, since some parts of it never stop changing
+settlelimit = 3
+
+# The script behind scrolling the conversation, by a fraction of the viewport's height
+# Returns whether the page actually scrolled, which it won't at either end of it
+scroll_script = """
+(fraction) => {
+	const before = window.scrollY;
+	window.scrollBy(0, window.innerHeight * fraction);
+	return window.scrollY !== before;
+}
+"""
+
+# The script behind settle()
+# Resolves once nothing on the page has changed for a moment, or after the timeout
+settle_script = """
+(timeout) => new Promise((resolve) => {
+	let quiet = null;
+	let deadline = null;
+	const observer = new MutationObserver(() => {
+		clearTimeout(quiet);
+		quiet = setTimeout(done, 250);
+	});
+	const done = () => {
+		observer.disconnect();
+		clearTimeout(quiet);
+		clearTimeout(deadline);
+		resolve();
+	};
+	
+	observer.observe(document.body, {childList: true, subtree: true});
+	quiet = setTimeout(done, 250);
+	deadline = setTimeout(done, timeout);
+})
+"""
+
+### article_inventory(): everything detect() needs to know about every article on the page, from a single evaluation in the page
+# Each article has:
+# - 'index':   its position among the page's articles, for page.get_by_role("article").nth()
+# - 'href':    the last link in it, which is the link to the tweet itself
+# - 'handle':  the tweet's author and 'id' the tweet's ID, when 'href' is a link to a tweet
+# - 'deleted': whether it's the placeholder for a deleted or unavailable tweet, with its message in 'text'
+# - 'box':     its bounding box in the page's viewport
+# Asking playwright about each article and link separately costs a round trip to the browser apiece, which adds up to thousands on a long thread
+async def article_inventory(search: dict, page: Page) -> list:
+	with search['timer'].span("inventory"):
+		return await page.evaluate(inventory_script)
+
+# The script behind article_inventory()
+# Hidden elements are skipped the same way playwright's get_by_role() skips them, so that the indexes line up
+inventory_script = """
+() => {
+	const notice = "https://help.twitter.com/rules-and-policies/notices-on-twitter";
+	const visible = (element) => element.getClientRects().length > 0 && element.closest('[aria-hidden="true"]') === null;
+	
+	const articles = Array.from(document.querySelectorAll('article, [role="article"]')).filter(visible);
+	return articles.map((article, index) => {
+		const links = Array.from(article.querySelectorAll('a[href], [role="link"]')).filter(visible);
+		const href = links.length > 0 ? links[links.length - 1].getAttribute('href') : null;
+		const box = article.getBoundingClientRect();
+		
+		const entry = {
+			index: index,
+			href: href,
+			handle: null,
+			id: null,
+			deleted: href === notice,
+			text: null,
+			box: {x: box.x, y: box.y, width: box.width, height: box.height},
+		};
+		
+		if (entry.deleted) {
+			entry.text = article.innerText;
+		} else if (href !== null) {
+			// Links to tweets look like '/handle/status/id', sometimes with more on the end (such as '/analytics')
+			const split = href.split('/');
+			if (split.length >= 4 && split[0] === "" && split[2] === "status") {
+				entry.handle = split[1];
+				entry.id = split[3];
+			}
+		}
+		
+		return entry;
+	});
+}
+"""
 
 ### fullwait(): waits for the page to fully load and present tweets
 # Used in detect()
 async def fullwait(search, page: Page, progress_callback):
+	with search['timer'].span("fullwait"):
+		return await wait_for_tweets(search, page, progress_callback)
+
+### wait_for_tweets(): the retrying wait behind fullwait()
+# An observer in the page reports back as soon as the tweet (or an error) shows up, so a fast page isn't held up by a fixed wait
+# and a slow one is only given up on after '--ready-timeout' seconds
+async def wait_for_tweets(search, page: Page, progress_callback):
 	log = logging.getLogger(__name__)
 	# Catch potential page loading error
 	# Waits until we can see the elements we need that prove that the page didn't just load, but loaded correctly
 	progress_callback.emit((0, 0, "", 2, None))
 	
+	# Wait for the tweet that the page is for, rather than just any tweet
+	tweet = parseTweetURL(page.url)
+	if tweet is not None:
+		tweetid = tweet[1]
+	else:
+		tweetid = None
+	
+	start = time.monotonic()
 	retrylimit = 3
 	for retries in range(retrylimit):
 		# Attempt to fully load the tweets multiple times
 		try:
-			timeline = page.get_by_label("Home timeline").last
-			await timeline.wait_for()
-		except PlaywrightTimeoutError:
-			# TODO RELEASE GET THIS RIGHT TIMEOUTERROR
-			if retries == (retrylimit - 1):
-				log.error("Page failed to load timeline.")
-				return False
-			else:
-				log.warning("WARNING: Page failed to load timeline. Reloading..")
-				await page.reload()
-				continue
-		# Check if there is a tweet *or* an error waiting for us
-		tweetloaded = page.get_by_test_id("reply").last
-		tweeterror = page.get_by_test_id("error-detail").last
+			state = await page.evaluate(ready_script, {'id': tweetid, 'timeout': search['args'].ready_timeout * 1000})
+		except PlaywrightError:
+			# The page navigated (or reloaded itself) out from under the observer, so watch the new page instead
+			log.debug("Page changed while waiting for it to be ready, waiting again")
+			state = "navigated"
 		
-		# Expect either having tweets or message saying no tweets, raise exception if not
-		try:
-			await expect(tweetloaded.or_(tweeterror), "Page failed to load necessary elements. Possibly a race condition/network issue").to_be_visible(timeout=15000)
-			
-			# No need to retry loading if there was no problem
+		# Either the tweet or a message saying there is no tweet counts as having loaded
+		if state == "tweet" or state == "error":
+			log.debug("Page ready (" + state + ") in " + str(round(time.monotonic() - start, 2)) + "s: '" + page.url + "'")
 			break
-		except AssertionError as exception:
-			if retries == (retrylimit - 1):
-				log.error("Page failed to load necessary elements. Possibly a race condition/network issue")
-				await killshot(search, page)
-				# Naturally with a lot of these, the extra time to take the screenshot won't be representative of what was at the exact time of error
-				
-				# Instead of raising the exception, return that it failed so we can move on to the next search
-				#raise
-				return False
+		
+		if retries == (retrylimit - 1):
+			log.error("Page failed to load necessary elements after " + str(round(time.monotonic() - start, 2)) + "s. Possibly a race condition/network issue")
+			await killshot(search, page)
+			# Naturally with a lot of these, the extra time to take the screenshot won't be representative of what was at the exact time of error
+			
+			# Instead of raising the exception, return that it failed so we can move on to the next search
+			#raise
+			return False
+		
+		if state == "timeout":
+			log.warning("WARNING: Page failed to load necessary elements. Trying again...")
+			
+			# Click the retry button instead of loading the page. More reliable but doesn't always work
+			retry = page.get_by_role("button", name="Retry", exact=True)
+			if await retry.count() > 0:
+				await retry.first.click()
+				log.debug("Pushed 'retry' button")
 			else:
-				log.warning("WARNING: Page failed to load necessary elements. Trying again...")
-				
-				# Click the retry button instead of loading the page. More reliable but doesn't always work
-				buttons = await timeline.get_by_role("button").all()
-				for button in buttons:
-					buttontext = await button.text_content()
-					
-					if buttontext == "Retry":
-						await button.click()
-						log.debug("Pushed 'retry' button")
-						break
+				with search['timer'].span("reload"):
+					await page.reload(wait_until="domcontentloaded")
 	
 	progress_callback.emit((0, 0, "", 3, None))
 	# Return successful loading
 	return True
 
+# The observer behind wait_for_tweets(), which resolves to:
+# - 'tweet':   the article for the tweet (or any article, when the page isn't for a tweet) has rendered, down to its reply button
+# - 'error':   x.com is showing an error instead, such as for a deleted tweet
+# - 'timeout': neither showed up before the deadline
+ready_script = """
+({id, timeout}) => new Promise((resolve) => {
+	const selector = id === null ? 'article' : 'article a[href$="/status/' + id + '"], article a[href*="/status/' + id + '/"]';
+	
+	const check = () => {
+		for (const element of document.querySelectorAll(selector)) {
+			const article = element.closest('article');
+			if (article !== null && article.querySelector('[data-testid="reply"]') !== null) {
+				return "tweet";
+			}
+		}
+		if (document.querySelector('[data-testid="error-detail"]') !== null) {
+			return "error";
+		}
+		return null;
+	};
+	
+	const state = check();
+	if (state !== null) {
+		resolve(state);
+		return;
+	}
+	
+	let deadline = null;
+	const observer = new MutationObserver(() => {
+		const state = check();
+		if (state !== null) {
+			observer.disconnect();
+			clearTimeout(deadline);
+			resolve(state);
+		}
+	});
+	deadline = setTimeout(() => {
+		observer.disconnect();
+		resolve("timeout");
+	}, timeout);
+	
+	observer.observe(document, {childList: true, subtree: true});
+})
+"""
+
 ##### END PLAYWRIGHT FUNCTIONS
 
 ##### BEGIN TRAVERSAL FUNCTIONS
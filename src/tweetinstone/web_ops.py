@@ -0,0 +1,276 @@
+### web_ops.py
+# Functions for fetching things from the web outside of the web browser, such as resolving t.co links and downloading images
+
+import time
+import sqlite3
+import hashlib
+import tempfile
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+## Import TIS-specific functions
+from tweetinstone.network import mirror_url
+
+# requests is imported by the functions that use it, so that nothing pays to load it until a tweet actually needs it
+
+# How many requests can be made at once, which is also how many connections to each host are kept open for reuse
+workers = 8
+
+# How many times a download is tried before giving up on it, how long to wait on each try (in seconds),
+# and how big (in bytes) a download can get before it's moved from memory to a temporary file
+retrylimit = 3
+downloadtimeout = 30
+spoolsize = 8 * 1048576
+
+# The most seconds to wait before trying a download again after being told to slow down (HTTP 429)
+retrywait = 10
+
+# How many videos can be downloaded at once
+# Videos take minutes to download where images and links take moments, so they get their own threads, so that a few of them can't hold up every other job's images and links
+videoworkers = 4
+
+# One session and one pool of threads for the whole process, so that connections are reused from one tweet to the next
+session = None
+executor = None
+videoexecutor = None
+
+# The same goes for the link cache, which is opened once per file rather than for every tweet (see shared_link_cache())
+linkcaches = {}
+
+### web_session(): the requests session shared by the whole process, made the first time it's needed
+def web_session():
+	global session
+	if session is None:
+		import requests
+		from requests.adapters import HTTPAdapter
+
+		adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+		session = requests.Session()
+		session.mount("http://", adapter)
+		session.mount("https://", adapter)
+	return session
+
+### run_blocking(): run a blocking function on the shared pool of threads, so that it doesn't hold up the event loop
+async def run_blocking(function, *args):
+	global executor
+	if executor is None:
+		executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tis_web")
+	return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+### submit_video(): start a blocking video download on the pool of threads for videos
+# Returns the concurrent.futures.Future for it (which asyncio.wrap_future() can wait on), so that whoever started it can tell when the thread is actually done
+def submit_video(function, *args):
+	global videoexecutor
+	if videoexecutor is None:
+		videoexecutor = ThreadPoolExecutor(max_workers=videoworkers, thread_name_prefix="tis_video")
+	return videoexecutor.submit(function, *args)
+
+### resolve_link(): follow a shortened link to wherever it ends up
+# 'mirror' is where links are resolved instead of t.co, if anywhere (see mirror_url())
+# Blocking, so it's run by resolve_links() on the shared pool of threads
+def resolve_link(short: str, mirror: str, timeout: float) -> dict:
+	import requests
+
+	linkdata = {'short': short}
+	try:
+		# Streamed so that only the headers are read; where the link goes is all that matters, not what's there
+		response = web_session().get(mirror_url(mirror, short), timeout=timeout, stream=True)
+		response.close()
+
+		# Sometimes, these return 403 errors, but do resolve correctly, so I just jank it together
+		# For debugging purposes, to show that the resolution had some jank in it (and in case of legit access failures), also attach the fact that the error code was received
+		if response.status_code >= 400:
+			linkdata['error'] = "HTTP Error " + str(response.status_code) + ": " + response.reason
+		target = response.url
+	except requests.RequestException as error:
+		target = "UNKNOWN"
+		linkdata['error'] = "URL Error: " + str(error)
+
+	# Put THAT url in as the target
+	linkdata['target'] = target
+	return linkdata
+
+### resolve_links(): resolve a tweet's shortened links all at once, in the same order
+# Links in the link cache (see LinkCache) aren't resolved again
+async def resolve_links(shorts: list, args) -> list:
+	log = logging.getLogger(__name__)
+
+	# Most tweets don't have any links
+	if len(shorts) == 0:
+		return []
+
+	# The cache is a file on disk, so it's read and written on the shared pool of threads too
+	cache = shared_link_cache(args)
+	resolved = {}
+	if cache is not None:
+		resolved = await run_blocking(cache.lookup, shorts)
+		if len(resolved) > 0:
+			log.debug("Found " + str(len(resolved)) + " shortened links in the link cache")
+
+	# The same link can show up more than once in a tweet, but only needs resolving once
+	unresolved = list(dict.fromkeys(short for short in shorts if short not in resolved))
+	results = await asyncio.gather(*[run_blocking(resolve_link, short, args.mirror, args.link_timeout) for short in unresolved])
+
+	for linkdata in results:
+		resolved[linkdata['short']] = linkdata
+
+	# Links that couldn't be reached at all might work next time, so only the ones that went somewhere are kept
+	if cache is not None:
+		await run_blocking(cache.store, [linkdata for linkdata in results if linkdata['target'] != "UNKNOWN"])
+
+	return [dict(resolved[short]) for short in shorts]
+
+### download(): download a file into a temporary file, hashing it as it comes in
+# Returns the temporary file (rewound, for reading) and its sha256
+# Downloads that come back empty, cut short or with a server error are tried again, since pbs.twimg.com sometimes sends back nothing
+# Being told to slow down (HTTP 429) is waited out and tried again too, but any other error (such as a 404) raises requests.HTTPError, since asking again won't change it
+# An error page is never returned as the file
+# Blocking, so it's run by download_files() on the shared pool of threads
+def download(url: str) -> tuple:
+	import requests
+
+	log = logging.getLogger(__name__)
+	for attempt in range(retrylimit):
+		last = attempt == retrylimit - 1
+
+		# Small files stay in memory, and big ones are written out to disk instead
+		file = tempfile.SpooledTemporaryFile(max_size=spoolsize)
+		# Reference: https://docs.python.org/3/library/hashlib.html
+		filehash = hashlib.sha256()
+		error = None
+		try:
+			with web_session().get(url, timeout=downloadtimeout, stream=True) as response:
+				if response.status_code >= 400:
+					error = requests.HTTPError("HTTP Error " + str(response.status_code) + ": " + response.reason, response=response)
+				else:
+					for chunk in response.iter_content(chunk_size=65536):
+						file.write(chunk)
+						filehash.update(chunk)
+
+					# The length in the headers is of what was sent, which is what the connection has read (before any decompression)
+					expected = response.headers.get('Content-Length')
+					complete = file.tell() > 0 and (expected is None or int(expected) == response.raw.tell())
+		except requests.RequestException as error:
+			if last:
+				file.close()
+				raise
+			log.warning("Download of '" + url + "' failed (" + str(error) + "). Trying again...")
+			file.close()
+			continue
+
+		if error is not None:
+			file.close()
+			status = error.response.status_code
+			if last or (status < 500 and status != 429):
+				raise error
+			log.warning("Download of '" + url + "' failed (" + str(error) + "). Trying again...")
+			if status == 429:
+				time.sleep(retry_after(error.response, attempt))
+			continue
+
+		if complete or last:
+			if not complete:
+				log.warning("Download of '" + url + "' was empty or incomplete after " + str(retrylimit) + " tries")
+			file.seek(0)
+			return (file, filehash.hexdigest())
+
+		log.warning("Download of '" + url + "' was empty or incomplete. Trying again...")
+		file.close()
+
+### retry_after(): how many seconds to wait before trying again after being told to slow down
+# Waits as long as the server asks (if it says, in seconds), and otherwise a little longer each try, but never more than 'retrywait'
+def retry_after(response, attempt: int) -> float:
+	try:
+		wait = float(response.headers.get('Retry-After'))
+	except (TypeError, ValueError):
+		wait = 2 ** attempt
+	return min(max(wait, 0), retrywait)
+
+### spool(): put something that's already been downloaded into a temporary file, the same as download() returns
+def spool(data: bytes) -> tuple:
+	file = tempfile.SpooledTemporaryFile(max_size=spoolsize)
+	file.write(data)
+	file.seek(0)
+	return (file, hashlib.sha256(data).hexdigest())
+
+### file_sha256(): the sha256 of a file on disk, read a piece at a time
+def file_sha256(filename: str) -> str:
+	filehash = hashlib.sha256()
+	with open(filename, 'rb') as file:
+		for chunk in iter(lambda: file.read(65536), b''):
+			filehash.update(chunk)
+	return filehash.hexdigest()
+
+### download_files(): download several files at once, in the same order (see download())
+async def download_files(urls: list) -> list:
+	return await asyncio.gather(*[run_blocking(download, url) for url in urls])
+
+### LinkCache: where shortened links have been resolved to before, kept on disk between runs
+# t.co links show up again and again in retweets, quotes and threads, and where one goes doesn't change
+# SQLite is used so that 'tis batch' worker processes can share the same file
+# Any thread can use it, though only one at a time
+class LinkCache:
+	# 'ttl' is how many days a resolved link is trusted for, and 'size' the most links kept (the least recently resolved are dropped first)
+	def __init__(self, filename: str, ttl: float, size: int):
+		self.ttl = ttl * 86400
+		self.size = size
+
+		# The generous timeout is for when several worker processes write at once
+		self.connection = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+		self.lock = threading.Lock()
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS links (short TEXT PRIMARY KEY, target TEXT NOT NULL, error TEXT, resolved REAL NOT NULL)")
+		self.connection.execute("CREATE INDEX IF NOT EXISTS links_resolved ON links (resolved)")
+
+	### lookup(): the links that are in the cache and haven't expired, keyed by the shortened link
+	def lookup(self, shorts: list) -> dict:
+		if len(shorts) == 0:
+			return {}
+
+		oldest = time.time() - self.ttl
+		with self.lock:
+			rows = self.connection.execute("SELECT short, target, error FROM links WHERE resolved >= ? AND short IN (" + ','.join('?' * len(shorts)) + ")", [oldest] + list(shorts)).fetchall()
+
+		links = {}
+		for (short, target, error) in rows:
+			linkdata = {'short': short}
+			if error is not None:
+				linkdata['error'] = error
+			linkdata['target'] = target
+			links[short] = linkdata
+		return links
+
+	### store(): add newly resolved links, then drop expired links and any beyond the size cap
+	def store(self, links: list) -> None:
+		if len(links) == 0:
+			return
+
+		now = time.time()
+		with self.lock:
+			self.connection.executemany("INSERT OR REPLACE INTO links (short, target, error, resolved) VALUES (?, ?, ?, ?)", [(linkdata['short'], linkdata['target'], linkdata.get('error'), now) for linkdata in links])
+			self.connection.execute("DELETE FROM links WHERE resolved < ?", (now - self.ttl,))
+			self.connection.execute("DELETE FROM links WHERE short IN (SELECT short FROM links ORDER BY resolved DESC LIMIT -1 OFFSET ?)", (self.size,))
+
+	def close(self) -> None:
+		with self.lock:
+			self.connection.close()
+
+### open_link_cache(): open the link cache if one is wanted
+def open_link_cache(args):
+	if args.link_cache is not None:
+		return LinkCache(args.link_cache, args.link_cache_days, args.link_cache_size)
+	else:
+		return None
+
+### shared_link_cache(): the link cache for the whole process, opened the first time it's needed (see open_link_cache())
+# Left open until the process exits, like the requests session
+def shared_link_cache(args):
+	if args.link_cache is None:
+		return None
+
+	if args.link_cache not in linkcaches:
+		linkcaches[args.link_cache] = open_link_cache(args)
+	return linkcaches[args.link_cache]
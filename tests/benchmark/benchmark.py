@@ -0,0 +1,134 @@
+### benchmark.py
+# Offline end-to-end benchmark: search fixed corpora of synthetic tweets from a local stand-in for x.com (see mockserver.py)
+# Nothing here touches the network, so runs can be compared with each other to catch performance regressions
+#
+# Usage: python tests/benchmark/benchmark.py [--corpus text images threads video] [--json results.json] [any other tis options]
+# For example, '-j 4 --network-profile full' benchmarks those tis options
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+# Run against the tis in this checkout, rather than whichever one happens to be installed
+benchmarkdir = Path(__file__).resolve().parent
+sys.path.insert(0, str(benchmarkdir.parents[1] / "src"))
+sys.path.insert(0, str(benchmarkdir))
+
+corpora = ['text', 'images', 'threads', 'video']
+
+### peak_rss(): the peak resident memory, in MB, of this process and of its largest child process (the browser, ffmpeg, etc)
+def peak_rss() -> tuple:
+	# ru_maxrss is in KB on linux, but bytes on macOS
+	if sys.platform == "darwin":
+		unit = 1048576
+	else:
+		unit = 1024
+
+	own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+	return (own, children)
+
+### bytes_written(): the total size of the files under a directory
+def bytes_written(directory: str) -> int:
+	total = 0
+	for (root, dirs, files) in os.walk(directory):
+		for file in files:
+			total += os.path.getsize(os.path.join(root, file))
+	return total
+
+### run_corpus(): search one corpus in a fresh process and measure it
+# A fresh process for each corpus keeps its peak memory use from being muddied by the others
+def run_corpus(name: str, mirror: str, tisoptions: list, verbose: bool) -> dict:
+	from tweetinstone.arguments import parser_setup
+	from tweetinstone.progress import Progress
+	from tweetinstone.search import parse_searchfile, read_input, run_playwright
+
+	if verbose:
+		logging.basicConfig(level=logging.DEBUG)
+	else:
+		logging.basicConfig(level=logging.WARNING)
+
+	urls = parse_searchfile(open(benchmarkdir / (name + ".txt"), 'r'))
+	args = parser_setup().parse_args(urls + tisoptions + ['--mirror', mirror])
+
+	# Archives are written to the working directory, so each corpus gets an empty one to measure
+	with tempfile.TemporaryDirectory(prefix="tis_benchmark_" + name + "_") as outputdir:
+		os.chdir(outputdir)
+
+		start = time.monotonic()
+		result = asyncio.run(run_playwright(args, read_input(args), Progress()))
+		elapsed = time.monotonic() - start
+
+		written = bytes_written(outputdir)
+		os.chdir(benchmarkdir)
+
+	(ownrss, childrss) = peak_rss()
+
+	failed = 0
+	if len(result) > 0:
+		failed = len(result[0])
+
+	return {
+		'corpus': name,
+		'urls': len(urls),
+		'failed': failed,
+		'seconds': round(elapsed, 2),
+		'urls_per_minute': round(len(urls) / elapsed * 60, 2),
+		'peak_rss_mb': round(ownrss, 1),
+		'peak_child_rss_mb': round(childrss, 1),
+		'mb_written': round(written / 1048576, 2),
+	}
+
+### print_results(): print a table of the results of each corpus
+def print_results(results: list) -> None:
+	columns = [('corpus', 10), ('urls', 6), ('failed', 8), ('seconds', 9), ('urls_per_minute', 10), ('peak_rss_mb', 10), ('peak_child_rss_mb', 12), ('mb_written', 10)]
+	headers = {'urls_per_minute': "urls/min", 'peak_rss_mb': "rss MB", 'peak_child_rss_mb': "child rss MB", 'mb_written': "MB written"}
+
+	print(''.join(headers.get(column, column).rjust(width) for (column, width) in columns))
+	for result in results:
+		print(''.join(str(result[column]).rjust(width) for (column, width) in columns))
+
+def main():
+	parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of tis against a local stand-in for x.com. Options not listed here are passed on to tis")
+	parser.add_argument('--corpus', nargs='+', choices=corpora, default=corpora, help="which corpora to search (default: all of them)")
+	parser.add_argument('--json', metavar='[file.json]', type=str, help="also save the results to a JSON file, for comparing runs")
+	parser.add_argument('-v','--verbose', action='store_true', default=False, help="print tis's debug output")
+	(options, tisoptions) = parser.parse_known_args()
+
+	if options.verbose:
+		logging.basicConfig(level=logging.DEBUG)
+		tisoptions.append('--verbose')
+
+	from mockserver import MockServer
+	mock = MockServer(str(benchmarkdir / "corpus.json"))
+	mock.start()
+	print("Mock x.com serving at " + mock.url)
+
+	results = []
+	try:
+		for name in options.corpus:
+			print("Benchmarking corpus '" + name + "'")
+			with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+				results.append(pool.submit(run_corpus, name, mock.url, tisoptions, options.verbose).result())
+	finally:
+		mock.stop()
+
+	print_results(results)
+
+	if options.json is not None:
+		with open(options.json, 'w') as file:
+			json.dump({'tis_options': tisoptions, 'results': results}, file, indent=2)
+		print("Results saved to '" + options.json + "'")
+
+if __name__ == "__main__":
+	main()
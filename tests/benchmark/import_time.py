@@ -0,0 +1,78 @@
+### import_time.py
+# Measure how long tis takes to start, and which heavy libraries each kind of startup loads
+# Short-lived runs ('--help', batch workers, containers) pay for every import every time, so this should stay low
+#
+# Usage: python tests/benchmark/import_time.py [--runs 10]
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+from pathlib import Path
+
+srcdir = Path(__file__).resolve().parents[2] / "src"
+
+# Libraries that only some features need, which shouldn't be loaded by anything that doesn't use them
+heavy = ['PySide6', 'playwright', 'yt_dlp', 'PIL', 'bs4', 'lxml', 'ffmpeg', 'requests']
+
+# What gets run for each kind of startup
+scenarios = {
+	'tis --help': "import sys; sys.argv = ['tis', '--help']; from tweetinstone.main import main_cli; main_cli()",
+	'tis --version': "import sys; sys.argv = ['tis', '--version']; from tweetinstone.main import main_cli; main_cli()",
+	'import search': "import tweetinstone.search",
+	'import batch': "import tweetinstone.batch",
+}
+
+### run_scenario(): run a scenario once, returning its wall time and its '-X importtime' report
+def run_scenario(code: str) -> tuple:
+	env = dict(os.environ)
+	env['PYTHONPATH'] = str(srcdir) + os.pathsep + env.get('PYTHONPATH', "")
+
+	start = time.monotonic()
+	process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+	elapsed = time.monotonic() - start
+
+	return (elapsed, process.stderr)
+
+### parse_importtime(): the total import time in seconds, and the top-level modules that were imported
+# Each line of '-X importtime' is 'import time: self | cumulative | name', with the name indented by how deeply it was imported
+def parse_importtime(report: str) -> tuple:
+	total = 0
+	modules = set()
+	for line in report.splitlines():
+		if not line.startswith("import time:") or "cumulative" in line:
+			continue
+
+		fields = line.split('|')
+		name = fields[2].rstrip()
+		modules.add(name.strip().split('.')[0])
+
+		# Only count modules imported at the top level, since their cumulative time already includes everything below them
+		if not name.startswith("  "):
+			total += int(fields[1])
+
+	return (total / 1000000, modules)
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure how long tis takes to start, and which heavy libraries it loads")
+	parser.add_argument('--runs', metavar='[integer]', type=int, default=10, help="number of times to run each scenario (default: 10)")
+	options = parser.parse_args()
+
+	print("scenario".ljust(18) + "wall (s)".rjust(10) + "imports (s)".rjust(13) + "   heavy libraries loaded")
+	for (name, code) in scenarios.items():
+		walltimes = []
+		importtimes = []
+		for run in range(options.runs):
+			(elapsed, report) = run_scenario(code)
+			(importtime, modules) = parse_importtime(report)
+			walltimes.append(elapsed)
+			importtimes.append(importtime)
+
+		loaded = [module for module in heavy if module in modules]
+		print(name.ljust(18) + ("%.3f" % statistics.median(walltimes)).rjust(10) + ("%.3f" % statistics.median(importtimes)).rjust(13) + "   " + (', '.join(loaded) or "none"))
+
+if __name__ == "__main__":
+	main()
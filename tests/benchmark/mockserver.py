@@ -0,0 +1,175 @@
+### mockserver.py
+# A local stand-in for x.com, t.co and pbs.twimg.com, so that the benchmark doesn't need the network (or an account)
+# Requests arrive from tis's '--mirror' as '/[host]/[path]' (see mirror_url() in tweetinstone/network.py)
+# Tweet pages only have as much of x.com's markup as tis actually looks at: the timeline, articles, test IDs and roles
+
+import json
+import html
+import ffmpeg
+import logging
+import tempfile
+import threading
+
+from io import BytesIO
+from PIL import Image
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Just enough style for the screenshots to be the size and shape of a real tweet
+stylesheet = """
+body { margin: 0; font-family: sans-serif; background: #000; color: #e7e9ea; }
+@media (prefers-color-scheme: light) { body { background: #fff; color: #0f1419; } }
+main { width: 600px; margin: 0 auto; }
+article { display: block; padding: 12px 16px; border-bottom: 1px solid #2f3336; cursor: pointer; }
+a { color: #1d9bf0; text-decoration: none; }
+[data-testid="User-Name"] { font-weight: bold; }
+[data-testid="tweetText"] { margin: 4px 0 12px 0; font-size: 15px; line-height: 20px; }
+[data-testid="tweetPhoto"] { display: inline-block; margin: 2px; }
+[data-testid="tweetPhoto"] img { width: 280px; height: 158px; object-fit: cover; border-radius: 8px; }
+[data-testid="videoPlayer"] { width: 568px; height: 320px; background: #333; border-radius: 16px; }
+[data-testid="videoPlayer"] video { width: 100%; height: 100%; }
+time { color: #71767b; font-size: 15px; }
+div[role="group"] { display: flex; justify-content: space-between; margin-top: 12px; }
+button { background: none; border: none; color: #71767b; min-width: 40px; }
+"""
+
+### MockServer: serves the tweets in a corpus file on a local port, on a background thread
+class MockServer:
+	def __init__(self, corpusfile: str):
+		log = logging.getLogger(__name__)
+
+		with open(corpusfile) as file:
+			self.tweets = json.load(file)['tweets']
+
+		# Every image and video is the same generated file; only their names differ
+		log.debug("Generating benchmark media")
+		self.image = generate_image()
+		self.videofile = generate_video()
+		with open(self.videofile.name, 'rb') as file:
+			self.video = file.read()
+
+		server = self
+		class Handler(MockHandler):
+			mock = server
+
+		# Port 0 lets the OS pick a free port
+		self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self.url = "http://127.0.0.1:" + str(self.httpd.server_address[1])
+
+		self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+	def start(self) -> None:
+		self.thread.start()
+
+	def stop(self) -> None:
+		self.httpd.shutdown()
+		self.httpd.server_close()
+		self.videofile.close()
+
+	### chain(): the tweet and every tweet it is replying to, oldest first
+	def chain(self, id: str) -> list:
+		tweets = []
+		while id is not None and id in self.tweets:
+			tweets.insert(0, (id, self.tweets[id]))
+			id = self.tweets[id]['replying_to']
+		return tweets
+
+	### tweet_page(): the html of a tweet's page, or None if there's no such tweet
+	def tweet_page(self, handle: str, id: str) -> str:
+		if id not in self.tweets or self.tweets[id]['handle'] != handle:
+			timeline = '<div data-testid="error-detail">Hmm...this page doesn\'t exist. Try searching for something else.</div>'
+		else:
+			timeline = ''.join(article(tweetid, tweet) for (tweetid, tweet) in self.chain(id))
+
+		return '<!DOCTYPE html><html><head><meta charset="utf-8"><style>' + stylesheet + '</style></head><body><main><div aria-label="Home timeline">' + timeline + '</div></main></body></html>'
+
+### article(): the html of one tweet
+def article(id: str, tweet: dict) -> str:
+	handle = html.escape(tweet['handle'])
+	status = "/" + handle + "/status/" + id
+
+	text = '<span>' + html.escape(tweet['text']) + '</span>'
+	for link in tweet['links']:
+		text += ' <a href="' + link + '" target="_blank">' + link + '</a>'
+
+	media = ''
+	for image in range(tweet['images']):
+		media += '<div data-testid="tweetPhoto"><img alt="Image" src="https://pbs.twimg.com/media/' + id + 'n' + str(image + 1) + '?format=jpg&amp;name=small"></div>'
+	if tweet['video']:
+		# A relative link, so that yt-dlp finds the same video in the mirrored page that the browser does
+		media += '<div data-testid="tweetPhoto"><div data-testid="videoPlayer"><video src="video.mp4" muted></video></div></div>'
+
+	# The link to the tweet itself is the last link in the article, like it is on x.com
+	return (
+		'<article role="article" onclick="location.href=\'' + status + '\'">'
+		+ '<div data-testid="User-Name"><a href="/' + handle + '">' + handle + '</a> <span>@' + handle + '</span></div>'
+		+ '<div data-testid="tweetText" lang="en">' + text + '</div>'
+		+ media
+		+ '<div><a href="' + status + '"><time datetime="2024-01-01T12:00:00.000Z">12:00 PM · Jan 1, 2024</time></a></div>'
+		+ '<div role="group"><button data-testid="reply">3</button><button data-testid="retweet">14</button><button data-testid="like">159</button><button data-testid="bookmark">2</button></div>'
+		+ '</article>'
+	)
+
+### generate_image(): a png the size of a typical tweet photo
+def generate_image() -> bytes:
+	image = BytesIO()
+	Image.new("RGB", (1200, 675), (29, 155, 240)).save(image, format='PNG')
+	return image.getvalue()
+
+### generate_video(): a short mp4 with audio, made by ffmpeg's test sources
+def generate_video():
+	videofile = tempfile.NamedTemporaryFile(suffix=".mp4")
+	(
+		ffmpeg
+		.output(
+			ffmpeg.input('testsrc2=size=1280x720:rate=30', f='lavfi', t=5),
+			ffmpeg.input('sine=frequency=440', f='lavfi', t=5),
+			videofile.name, vcodec='libx264', acodec='aac', pix_fmt='yuv420p', format='mp4'
+		)
+		.run(quiet=True, overwrite_output=True)
+	)
+	return videofile
+
+### MockHandler: answers one request to the mock server
+class MockHandler(BaseHTTPRequestHandler):
+	mock = None
+
+	def do_GET(self):
+		path = self.path.split('?')[0]
+		split = path.split('/')
+		host = split[1] if len(split) > 1 else ""
+
+		if path.endswith("/video.mp4"):
+			self.respond(200, "video/mp4", self.mock.video)
+		elif host in ("x.com", "twitter.com") and len(split) >= 5 and split[3] == "status":
+			page = self.mock.tweet_page(split[2], split[4])
+			self.respond(200, "text/html; charset=utf-8", page.encode('utf-8'))
+		elif host == "pbs.twimg.com":
+			self.respond(200, "image/png", self.mock.image)
+		elif host == "t.co" and len(split) >= 3:
+			# Shortened links resolve to somewhere else on the mirror, so resolving them doesn't leave it
+			self.send_response(301)
+			self.send_header("Location", self.mock.url + "/example.com/" + split[2])
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+		elif host == "example.com":
+			self.respond(200, "text/html; charset=utf-8", b"<!DOCTYPE html><html><body>Link target</body></html>")
+		else:
+			self.respond(404, "text/plain", b"")
+
+	def do_HEAD(self):
+		self.do_GET()
+
+	def do_POST(self):
+		# Analytics and the like; there's nothing to post to
+		self.respond(404, "text/plain", b"")
+
+	def respond(self, status: int, contenttype: str, body: bytes) -> None:
+		self.send_response(status)
+		self.send_header("Content-Type", contenttype)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		if self.command != "HEAD":
+			self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		logging.getLogger(__name__).debug(format % args)
@@ -0,0 +1,77 @@
+### test_journal.py
+# Recording the state of each search, and picking up where an interrupted run left off
+
+import argparse
+
+from tweetinstone import journal as journalmodule
+from tweetinstone.journal import Journal, open_journal
+from tweetinstone.text_ops import canonicalURL
+
+def journal_args(filename, input=None, resume=False) -> argparse.Namespace:
+	return argparse.Namespace(input=input, resume=resume, journal=filename)
+
+def test_resume_after_interrupted_run(tmp_path):
+	filename = str(tmp_path / "journal.sqlite")
+	urls = ["https://twitter.com/a/status/1", "https://twitter.com/a/status/2", "https://twitter.com/a/status/3", "https://twitter.com/a/status/4"]
+	
+	# The first run gets partway through before dying: one search done, one failed, one still running and one never started
+	journal = Journal(filename)
+	for url in urls:
+		journal.mark(url, "pending")
+	journal.mark(urls[0], "running")
+	journal.mark(urls[0], "done", "a_1.zip")
+	journal.mark(urls[1], "running")
+	journal.mark(urls[1], "failed")
+	journal.mark(urls[2], "running")
+	journal.connection.close() # No clean close, as if the process was killed
+	
+	# Resuming only skips what was actually captured
+	journal = open_journal(journal_args(filename, resume=True))
+	assert journal.completed() == {urls[0]}
+	
+	# The searches that were interrupted or failed run again, and are done this time
+	for url in urls[1:]:
+		journal.mark(url, "running")
+		journal.mark(url, "done", "a_" + url.split('/')[-1] + ".zip")
+	assert journal.completed() == set(urls)
+	journal.close()
+
+def test_failed_search_is_not_completed(tmp_path):
+	journal = Journal(str(tmp_path / "journal.sqlite"))
+	journal.mark("https://twitter.com/a/status/1", "running")
+	journal.mark("https://twitter.com/a/status/1", "failed")
+	
+	assert journal.completed() == set()
+	
+	row = journal.connection.execute("SELECT state, archive FROM searches WHERE url = ?", ("https://twitter.com/a/status/1",)).fetchone()
+	assert row == ("failed", None)
+	journal.close()
+
+def test_resume_matches_any_link_to_the_same_tweet(tmp_path):
+	journal = Journal(str(tmp_path / "journal.sqlite"))
+	journal.mark(canonicalURL("https://x.com/a/status/1?s=20"), "done", "a_1.zip")
+	
+	# Searches are journaled by their canonical url, so the same tweet linked differently is still skipped
+	assert canonicalURL("https://Twitter.com/a/status/1/photo/1") in journal.completed()
+	journal.close()
+
+def test_only_searches_from_a_file_get_a_journal(tmp_path):
+	filename = str(tmp_path / "journal.sqlite")
+	
+	assert open_journal(journal_args(filename)) is None
+	
+	journal = open_journal(journal_args(filename, input="urls.txt"))
+	assert journal is not None
+	journal.close()
+
+def test_completed_since(tmp_path, monkeypatch):
+	journal = Journal(str(tmp_path / "journal.sqlite"))
+	monkeypatch.setattr(journalmodule, "timestamp", lambda: "2024-01-01T00:00:00.000Z")
+	journal.mark("https://twitter.com/a/status/1", "done", "a_1.zip")
+	monkeypatch.setattr(journalmodule, "timestamp", lambda: "2024-01-02T00:00:00.000Z")
+	journal.mark("https://twitter.com/a/status/2", "done", "a_2.zip")
+	
+	# Only what was captured since a batch started counts as done by that batch
+	assert journal.completed("2024-01-02T00:00:00.000Z") == {"https://twitter.com/a/status/2"}
+	assert journal.completed() == {"https://twitter.com/a/status/1", "https://twitter.com/a/status/2"}
+	journal.close()
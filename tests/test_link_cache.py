@@ -0,0 +1,108 @@
+### test_link_cache.py
+# Remembering where shortened links go, and forgetting them once they're too old or there are too many
+
+import asyncio
+import argparse
+
+from tweetinstone import web_ops
+from tweetinstone.web_ops import LinkCache, open_link_cache
+
+def link(short: str, target: str, error: str = None) -> dict:
+	linkdata = {'short': short, 'target': target}
+	if error is not None:
+		linkdata['error'] = error
+	return linkdata
+
+class Clock:
+	def __init__(self):
+		self.now = 1700000000.0
+
+	def time(self) -> float:
+		return self.now
+
+def test_lookup_returns_what_was_stored(tmp_path):
+	cache = LinkCache(str(tmp_path / "links.sqlite"), 30, 100)
+	cache.store([link("https://t.co/a", "https://example.com/a"), link("https://t.co/b", "https://example.com/b", "HTTP Error 403: Forbidden")])
+	
+	assert cache.lookup(["https://t.co/a", "https://t.co/b", "https://t.co/missing"]) == {
+		"https://t.co/a": link("https://t.co/a", "https://example.com/a"),
+		"https://t.co/b": link("https://t.co/b", "https://example.com/b", "HTTP Error 403: Forbidden"),
+	}
+	assert cache.lookup([]) == {}
+	cache.close()
+
+def test_links_expire(tmp_path, monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(web_ops.time, "time", clock.time)
+	
+	cache = LinkCache(str(tmp_path / "links.sqlite"), 1, 100)
+	cache.store([link("https://t.co/old", "https://example.com/old")])
+	
+	# Still trusted within the day...
+	clock.now += 86000
+	cache.store([link("https://t.co/new", "https://example.com/new")])
+	assert set(cache.lookup(["https://t.co/old", "https://t.co/new"])) == {"https://t.co/old", "https://t.co/new"}
+	
+	# ...but not after it
+	clock.now += 1000
+	assert set(cache.lookup(["https://t.co/old", "https://t.co/new"])) == {"https://t.co/new"}
+	
+	# Expired links are dropped from the file the next time anything is stored
+	cache.store([link("https://t.co/newer", "https://example.com/newer")])
+	assert cache.connection.execute("SELECT short FROM links WHERE short = ?", ("https://t.co/old",)).fetchone() is None
+	cache.close()
+
+def test_least_recently_resolved_are_evicted(tmp_path, monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(web_ops.time, "time", clock.time)
+	
+	cache = LinkCache(str(tmp_path / "links.sqlite"), 30, 3)
+	for number in range(5):
+		clock.now += 1
+		cache.store([link("https://t.co/" + str(number), "https://example.com/" + str(number))])
+	
+	shorts = ["https://t.co/" + str(number) for number in range(5)]
+	assert set(cache.lookup(shorts)) == set(shorts[2:])
+	
+	# Resolving a link again makes it the most recent, so it outlives the ones that weren't
+	clock.now += 1
+	cache.store([link(shorts[2], "https://example.com/2")])
+	clock.now += 1
+	cache.store([link("https://t.co/5", "https://example.com/5")])
+	assert set(cache.lookup(shorts + ["https://t.co/5"])) == {shorts[2], shorts[4], "https://t.co/5"}
+	cache.close()
+
+def test_cache_is_shared_between_connections(tmp_path):
+	filename = str(tmp_path / "links.sqlite")
+	
+	writer = LinkCache(filename, 30, 100)
+	writer.store([link("https://t.co/a", "https://example.com/a")])
+	writer.close()
+	
+	# As another 'tis batch' worker process (or a later run) would see it
+	reader = LinkCache(filename, 30, 100)
+	assert reader.lookup(["https://t.co/a"])["https://t.co/a"]['target'] == "https://example.com/a"
+	reader.close()
+
+def test_cache_is_only_opened_when_asked_for(tmp_path):
+	args = argparse.Namespace(link_cache=None, link_cache_days=30, link_cache_size=100)
+	assert open_link_cache(args) is None
+	
+	args.link_cache = str(tmp_path / "links.sqlite")
+	cache = open_link_cache(args)
+	assert cache is not None
+	cache.close()
+
+def test_resolve_links_uses_one_cache_for_the_whole_process(tmp_path, monkeypatch):
+	monkeypatch.setattr(web_ops, "linkcaches", {})
+	args = argparse.Namespace(link_cache=str(tmp_path / "links.sqlite"), link_cache_days=30, link_cache_size=100, mirror=None, link_timeout=10)
+	
+	cache = web_ops.shared_link_cache(args)
+	assert web_ops.shared_link_cache(args) is cache
+	cache.store([link("https://t.co/a", "https://example.com/a")])
+	
+	# Every link is already in the cache, so nothing goes out to the web
+	assert asyncio.run(web_ops.resolve_links(["https://t.co/a", "https://t.co/a"], args)) == [link("https://t.co/a", "https://example.com/a")] * 2
+	assert asyncio.run(web_ops.resolve_links([], args)) == []
+	assert web_ops.linkcaches == {args.link_cache: cache}
+	cache.close()
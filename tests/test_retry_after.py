@@ -0,0 +1,22 @@
+### test_retry_after.py
+# How long a download waits after being told to slow down
+
+from tweetinstone import web_ops
+from tweetinstone.web_ops import retry_after
+
+class Response:
+	def __init__(self, headers: dict):
+		self.headers = headers
+
+def test_waits_as_long_as_asked():
+	assert retry_after(Response({'Retry-After': "3"}), 0) == 3
+
+def test_waits_longer_each_try_when_not_told():
+	assert [retry_after(Response({}), attempt) for attempt in range(3)] == [1, 2, 4]
+	
+	# Retry-After can be a date instead, which isn't worth parsing
+	assert retry_after(Response({'Retry-After': "Wed, 21 Oct 2015 07:28:00 GMT"}), 1) == 2
+
+def test_never_waits_too_long():
+	assert retry_after(Response({'Retry-After': "3600"}), 0) == web_ops.retrywait
+	assert retry_after(Response({'Retry-After': "-5"}), 0) == 0
@@ -0,0 +1,52 @@
+### test_text_ops.py
+# Parsing, validating and de-duplicating tweet urls
+
+import argparse
+
+import pytest
+
+from tweetinstone.text_ops import validURL, parseTweetURL, canonicalURL
+
+@pytest.mark.parametrize("url", [
+	"https://twitter.com/atomicthumbs/status/1649952816268742656",
+	"https://X.com/atomicthumbs/status/1649952816268742656",
+	"https://Mobile.Twitter.com/atomicthumbs/status/1649952816268742656?s=20",
+	"https://x.com/atomicthumbs/status/1649952816268742656/photo/1#top",
+	"https://www.x.com/atomicthumbs/status/1649952816268742656?s=46&t=abc",
+])
+def test_tweet_urls_parse_the_same(url):
+	assert parseTweetURL(url) == ("atomicthumbs", "1649952816268742656")
+	assert canonicalURL(url) == "https://twitter.com/atomicthumbs/status/1649952816268742656"
+	assert validURL(url)
+
+@pytest.mark.parametrize("url", [
+	"https://example.com/atomicthumbs/status/1649952816268742656",
+	"https://x.com/atomicthumbs/likes",
+	"https://x.com/atomicthumbs/status/notanid",
+	"https://x.com/atomicthumbs?s=20",
+	"x.com",
+])
+def test_other_urls_are_invalid(url):
+	assert parseTweetURL(url) is None
+	assert not validURL(url)
+
+def test_dedupe_urls_with_mixed_case_hosts():
+	# search.py loads the web browser library, so this needs the full install
+	search = pytest.importorskip("tweetinstone.search")
+	
+	args = argparse.Namespace(skip_existing=False)
+	urls = [
+		"https://twitter.com/atomicthumbs/status/1649952816268742656",
+		"https://X.COM/atomicthumbs/status/1649952816268742656?s=20",
+		"# just a comment",
+		"",
+		"https://x.com/someoneelse/status/1",
+		"https://example.com/not/a/tweet",
+		"https://Twitter.com/someoneelse/status/1/photo/1",
+	]
+	
+	assert list(search.dedupe_urls(args, urls)) == [
+		"https://twitter.com/atomicthumbs/status/1649952816268742656",
+		"https://x.com/someoneelse/status/1",
+		"https://example.com/not/a/tweet",
+	]